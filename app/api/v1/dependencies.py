@@ -0,0 +1,109 @@
+"""
+Query parameters shared by the endpoints that list cases.
+"""
+from datetime import datetime
+from typing import Any, List, Optional, Set
+
+from fastapi import HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from starlette.responses import Response
+
+from app import crud, schemas
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+
+
+def get_case_filters(
+    status: Optional[List[str]] = Query(None),
+    site: Optional[str] = None,
+    compset: Optional[str] = None,
+    driver: Optional[schemas.ModelDriver] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+) -> schemas.CaseFilters:
+    try:
+        return schemas.CaseFilters(
+            status=status,
+            site=site,
+            compset=compset,
+            driver=driver,
+            created_after=created_after,
+            created_before=created_before,
+        )
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+
+
+def get_case_cursor(
+    cursor: Optional[str] = Query(
+        None, description=f"The value of the {NEXT_CURSOR_HEADER} response header."
+    )
+) -> Optional[schemas.CaseCursor]:
+    if not cursor:
+        return None
+    try:
+        return schemas.CaseCursor.decode(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def get_case_fields(
+    fields: Optional[str] = Query(
+        None,
+        description="Comma separated list of the case fields to return. "
+        "By default, all the fields are returned.",
+    )
+) -> Optional[Set[str]]:
+    if not fields:
+        return None
+    requested_fields = {f.strip() for f in fields.split(",") if f.strip()}
+    invalid_fields = requested_fields - set(schemas.CaseWithTaskInfo.__fields__)
+    if invalid_fields:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid fields: {', '.join(sorted(invalid_fields))}",
+        )
+    return requested_fields
+
+
+def list_cases(
+    db: Session,
+    response: Response,
+    *,
+    filters: schemas.CaseFilters,
+    cursor: Optional[schemas.CaseCursor],
+    limit: Optional[int],
+    fields: Optional[Set[str]],
+) -> Any:
+    """
+    Return a page of cases.
+    If there can be more cases, the cursor for the next page is set in the `X-Next-Cursor` header.
+    """
+    cases_and_sites = crud.case.get_all_cases_with_site(
+        db, filters=filters, cursor=cursor, limit=limit, fields=fields
+    )
+
+    headers = {}
+    if limit and len(cases_and_sites) == limit:
+        (last_case, _) = cases_and_sites[-1]
+        headers[NEXT_CURSOR_HEADER] = schemas.CaseCursor(
+            date_created=last_case.date_created, id=last_case.id
+        ).encode()
+
+    if fields is not None:
+        # Partial cases do not match the response model of the endpoints,
+        # so they are validated by their own model and only the selected fields are returned.
+        return JSONResponse(
+            jsonable_encoder(
+                schemas.CaseWithTaskInfo.get_cases_summary(cases_and_sites, fields),
+                exclude_unset=True,
+            ),
+            headers=headers,
+        )
+
+    response.headers.update(headers)
+    return schemas.CaseWithTaskInfo.get_cases_with_task_info(cases_and_sites)
@@ -1,16 +1,33 @@
-from typing import Any, List
-from zipfile import ZipFile
+import asyncio
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, List, Optional, Set
 
-from fastapi import APIRouter, Body, Depends, HTTPException, UploadFile
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, UploadFile
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.requests import Request
+from starlette.responses import Response
 
 from app import crud, schemas, tasks
+from app.api.v1.dependencies import (
+    MAX_PAGE_SIZE,
+    get_case_cursor,
+    get_case_fields,
+    get_case_filters,
+    list_cases,
+)
 from app.core import settings
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
+from app.utils import archives, case_logs, history, summaries
 
 router = APIRouter()
 
+EVENTS_KEEPALIVE_INTERVAL = 15  # seconds
+LOG_PAGE_SIZE = 64 * 1024  # bytes
+
 
 @router.get("/model-info", response_model=schemas.ModelInfo)
 def get_model_info() -> Any:
@@ -26,17 +43,66 @@ def get_case_variables_config() -> Any:
     return schemas.CaseVariableConfig.get_variables_config()
 
 
+@router.get("/events")
+async def get_case_events(
+    request: Request, case_id: Optional[List[str]] = Query(None)
+) -> Any:
+    """
+    Stream case status changes and task results as Server-Sent Events.
+
+    Events are sent as `case-status` with `case_id` and `status`,
+    or `case-task` with `case_id`, `task_id`, `state` and `error`.
+    If `case_id` is given, only the events for those cases are sent.
+    """
+
+    async def event_stream() -> AsyncIterator[str]:
+        async with tasks.case_events.subscribe() as queue:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), timeout=EVENTS_KEEPALIVE_INTERVAL
+                    )
+                except asyncio.TimeoutError:
+                    # Keep the connection open through proxies.
+                    yield ": keepalive\n\n"
+                    continue
+                if case_id and event.get("case_id") not in case_id:
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/status-counts", response_model=List[schemas.CaseStatusCount])
+async def get_case_status_counts(db: AsyncSession = Depends(get_async_db)) -> Any:
+    """
+    Get the number of cases by site and status.
+    """
+    return await crud.case.get_status_counts(db)
+
+
 @router.get("/", response_model=List[schemas.CaseWithTaskInfo])
 def get_cases(
+    response: Response,
+    filters: schemas.CaseFilters = Depends(get_case_filters),
+    cursor: Optional[schemas.CaseCursor] = Depends(get_case_cursor),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[Set[str]] = Depends(get_case_fields),
     db: Session = Depends(get_db),
 ) -> Any:
     """
-    Get all cases.
+    Get all cases, sorted by id.
+
+    Results are paginated and sorted by creation date if `limit` is given.
+    The cursor to the next page is returned in the `X-Next-Cursor` header.
     """
-    return [
-        schemas.CaseWithTaskInfo.get_case_with_task_info(case, site)
-        for (case, site) in crud.case.get_all_cases_with_site(db)
-    ]
+    return list_cases(
+        db, response, filters=filters, cursor=cursor, limit=limit, fields=fields
+    )
 
 
 @router.get("/{case_id}", response_model=schemas.CaseWithTaskInfo)
@@ -72,6 +138,30 @@ def create_case(
     return schemas.CaseWithTaskInfo.get_case_with_task_info(case, site)
 
 
+@router.post("/ensembles", response_model=schemas.CaseEnsemble)
+def create_case_ensemble(
+    ensemble: schemas.CaseEnsembleCreate = Body(...),
+    data_file: UploadFile | None = None,
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Create the cases of an ensemble, which share the base case and its data.
+    Cases that already exist are skipped.
+    """
+    return crud.case.create_ensemble(db, obj_in=ensemble, data_file=data_file)
+
+
+@router.get("/ensembles/{ensemble_id}", response_model=schemas.CaseEnsemble)
+def get_case_ensemble(ensemble_id: str, db: Session = Depends(get_db)) -> Any:
+    """
+    Get the cases of an ensemble and the number of their creation tasks by status.
+    """
+    ensemble = crud.case.get_ensemble(db, id=ensemble_id)
+    if not ensemble:
+        raise HTTPException(status_code=404, detail="Ensemble not found")
+    return ensemble
+
+
 @router.post("/{case_id}", response_model=schemas.CaseWithTaskInfo)
 def run_case(case_id: str, db: Session = Depends(get_db)) -> Any:
     case_and_site = crud.case.get_case_with_site(db, id=case_id)
@@ -80,15 +170,20 @@ def run_case(case_id: str, db: Session = Depends(get_db)) -> Any:
 
     (case, site) = case_and_site
 
-    task = tasks.run_case.delay(case)
-    return schemas.CaseWithTaskInfo.get_case_with_task_info(
-        crud.case.update(
-            db,
-            db_obj=case,
-            obj_in={"status": schemas.CaseRunStatus.BUILDING, "run_task_id": task.id},
-        ),
-        site,
-    )
+    if case.status == schemas.CaseCreateStatus.INGESTING:
+        raise HTTPException(
+            status_code=409, detail="The data of the case is still being ingested"
+        )
+
+    # The status is set before the task is sent, so it does not overwrite
+    # a status set by the task.
+    crud.case.set_status(db, id=case.id, status=schemas.CaseRunStatus.BUILDING)
+    tasks.send_case_status_event(case.id, schemas.CaseRunStatus.BUILDING)
+    if settings.INPUT_DATA_PREFETCH:
+        tasks.prefetch_input_data.delay(case.id)
+    task = tasks.run_case.delay(case.id)
+    case = crud.case.update(db, db_obj=case, obj_in={"run_task_id": task.id})
+    return schemas.CaseWithTaskInfo.get_case_with_task_info(case, site)
 
 
 @router.delete("/{case_id}")
@@ -102,10 +197,99 @@ def delete_case(
     return crud.case.remove(db, id=case_id)
 
 
+@router.get("/{case_id}/steps", response_model=List[schemas.CaseStep])
+def get_case_steps(case_id: str, db: Session = Depends(get_db)) -> Any:
+    """
+    Get the pipeline steps of the case with the given id and their state.
+    Running a case again after a failure resumes from its first incomplete step.
+    """
+    case = crud.case.get(db, id=case_id)
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return tasks.get_case_steps(case)
+
+
+@router.get("/{case_id}/timeline", response_model=List[schemas.CaseEvent])
+def get_case_timeline(case_id: str, db: Session = Depends(get_db)) -> Any:
+    """
+    Get the status changes of the case with the given id, in the order they happened,
+    with the step that made each change and its duration in seconds.
+    """
+    case = crud.case.get(db, id=case_id)
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return crud.case.get_events(db, id=case_id)
+
+
+@router.get("/{case_id}/logs", response_model=List[schemas.CaseLog])
+def get_case_logs(case_id: str, db: Session = Depends(get_db)) -> Any:
+    """
+    List the step logs of the case with the given id.
+    """
+    case = crud.case.get(db, id=case_id)
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+
+    logs_path = case_logs.get_logs_path(case.env["CASE_FOLDER_NAME"])
+    if not logs_path.exists():
+        return []
+
+    logs = []
+    for log_path in sorted(logs_path.glob("*.log")):
+        stat = log_path.stat()
+        logs.append(
+            schemas.CaseLog(
+                step=log_path.stem,
+                size=stat.st_size,
+                date_modified=datetime.fromtimestamp(stat.st_mtime),
+            )
+        )
+    return logs
+
+
+@router.get("/{case_id}/logs/{step}", response_class=PlainTextResponse)
+def get_case_log(
+    case_id: str,
+    step: str,
+    offset: int = Query(
+        -LOG_PAGE_SIZE,
+        description="Byte offset to read from. Negative values are counted from the end.",
+    ),
+    limit: int = Query(LOG_PAGE_SIZE, ge=1, le=LOG_PAGE_SIZE),
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Read a step log of the case with the given id.
+
+    By default, the end of the log is returned.
+    The `X-Log-Offset` and `X-Log-Size` headers give the offset of the returned content
+    and the size of the log, so clients can follow a running step by requesting
+    `offset=X-Log-Offset + length of the content`.
+    """
+    case = crud.case.get(db, id=case_id)
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+
+    try:
+        log_path = case_logs.get_log_path(case.env["CASE_FOLDER_NAME"], step)
+        (content, start, size) = case_logs.read_log(log_path, offset, limit)
+    except (ValueError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail="Log not found")
+
+    return PlainTextResponse(
+        content.decode("utf-8", errors="replace"),
+        headers={"X-Log-Offset": str(start), "X-Log-Size": str(size)},
+    )
+
+
 @router.get("/{case_id}/download")
-def download_case(case_id: str, db: Session = Depends(get_db)) -> Any:
+def download_case(case_id: str, request: Request, db: Session = Depends(get_db)) -> Any:
     """
-    Download a compressed tarball of the case with the given id.
+    Download a zip archive of the case with the given id.
+
+    The archive is streamed while it is being created.
+    Once it is complete, conditional requests (If-None-Match)
+    and range requests (Range, If-Range) are supported until the case folder changes.
     """
     case_and_site = crud.case.get_case_with_site(db, id=case_id)
 
@@ -115,31 +299,185 @@ def download_case(case_id: str, db: Session = Depends(get_db)) -> Any:
     (case, site) = case_and_site
 
     case_folder_name = case.env["CASE_FOLDER_NAME"]
+    case_path = settings.CASES_ROOT / case_folder_name
+
+    if not case_path.exists():
+        raise HTTPException(status_code=404, detail="Case not found")
+
+    files = archives.get_case_files(case_path)
+    etag = f'"{archives.get_case_etag(case_path, files)}"'
+    headers = {
+        "Content-Disposition": f'attachment; filename="{case_folder_name}.zip"',
+        "ETag": etag,
+    }
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    ):
+        return Response(status_code=304, headers=headers)
+
+    archives.remove_stale_archives(case_folder_name, etag.strip('"'))
+    archive_path = archives.get_archive_path(case_folder_name, etag.strip('"'))
 
-    archive_name = settings.ARCHIVES_ROOT / f"{case_folder_name}.zip"
-    if archive_name.exists():
-        return FileResponse(
-            archive_name,
+    if not archive_path.exists():
+        return StreamingResponse(
+            archives.iter_zip(case_path, files, archive_path),
+            headers=headers,
+            media_type="application/zip",
+        )
+
+    headers["Accept-Ranges"] = "bytes"
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    size = archive_path.stat().st_size
+    byte_range = None
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = archives.parse_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"}
+            )
+    if byte_range:
+        (start, end) = byte_range
+        return StreamingResponse(
+            archives.iter_file_range(archive_path, start, end),
+            status_code=206,
             headers={
-                "Content-Disposition": f'attachment; filename="{case_folder_name}.zip"'
+                **headers,
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(end - start + 1),
             },
             media_type="application/zip",
         )
 
-    case_path = settings.CASES_ROOT / case_folder_name
+    return FileResponse(archive_path, headers=headers, media_type="application/zip")
 
-    if not case_path.exists():
+
+def get_case_path_or_404(case_id: str, db: Session) -> Path:
+    case = crud.case.get(db, id=case_id)
+    if not case:
         raise HTTPException(status_code=404, detail="Case not found")
+    return settings.CASES_ROOT / case.env["CASE_FOLDER_NAME"]
+
 
-    with ZipFile(archive_name, "w") as zip_file:
-        for f in case_path.rglob("*"):
-            if not f.is_symlink():
-                zip_file.write(f, arcname=f.relative_to(case_path))
-
-    return FileResponse(
-        archive_name,
-        headers={
-            "Content-Disposition": f'attachment; filename="{case_folder_name}.zip"'
-        },
-        media_type="application/zip",
+@router.get("/{case_id}/history", response_model=List[schemas.HistoryTape])
+def get_case_history(case_id: str, db: Session = Depends(get_db)) -> Any:
+    """
+    List the history tapes of the case with the given id,
+    with their files and time dependent variables.
+    """
+    case_path = get_case_path_or_404(case_id, db)
+
+    tapes = []
+    for (tape, files) in history.get_history_files(case_path).items():
+        history_files = []
+        for f in files:
+            stat = f.stat()
+            history_files.append(
+                schemas.HistoryFile(
+                    name=f.name,
+                    size=stat.st_size,
+                    date_modified=datetime.fromtimestamp(stat.st_mtime),
+                )
+            )
+        tapes.append(
+            schemas.HistoryTape(
+                tape=tape,
+                files=history_files,
+                variables=history.get_history_variables(files[0]),
+            )
+        )
+    return tapes
+
+
+@router.get("/{case_id}/history/{tape}")
+def read_case_history(
+    case_id: str,
+    tape: str,
+    variables: str = Query(..., description="Comma-separated variable names."),
+    start: Optional[str] = Query(None, description="Start date, e.g. 2000-01-01."),
+    end: Optional[str] = Query(None, description="End date (inclusive)."),
+    resample: Optional[str] = Query(
+        None, description="Resampling frequency of the means, e.g. 1D or 1M."
+    ),
+    format: schemas.HistoryFormat = schemas.HistoryFormat.json,
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Read variables of a history tape of the case with the given id.
+
+    The rows are streamed one history file at a time,
+    so long runs can be read without loading all their output.
+    """
+    case_path = get_case_path_or_404(case_id, db)
+
+    files = history.get_history_files(case_path).get(tape)
+    if not files:
+        raise HTTPException(status_code=404, detail="History tape not found")
+
+    variable_names = [v.strip() for v in variables.split(",") if v.strip()]
+    available_variables = {v.name for v in history.get_history_variables(files[0])}
+    unknown_variables = [v for v in variable_names if v not in available_variables]
+    if not variable_names or unknown_variables:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown variables: {', '.join(unknown_variables) or variables}",
+        )
+
+    if resample:
+        try:
+            history.validate_resample(resample)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        history.stream_history(files, variable_names, format, start, end, resample),
+        media_type=history.MEDIA_TYPES[format],
+    )
+
+
+@router.get("/{case_id}/summaries", response_model=schemas.HistorySummary)
+def get_case_summary_info(case_id: str, db: Session = Depends(get_db)) -> Any:
+    """
+    Get the variables and frequencies of the summaries of the case with the given id.
+    Summaries are computed after each run of the case.
+    """
+    case = crud.case.get(db, id=case_id)
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+
+    summary_info = summaries.get_summary_info(case.env["CASE_FOLDER_NAME"])
+    if not summary_info:
+        raise HTTPException(status_code=404, detail="Summaries not found")
+    return summary_info
+
+
+@router.get("/{case_id}/summaries/{frequency}")
+def read_case_summary(
+    case_id: str,
+    frequency: str,
+    variables: Optional[str] = Query(
+        None, description="Comma-separated variable names. All by default."
+    ),
+    db: Session = Depends(get_db),
+) -> Any:
+    """
+    Read the means of the summarized variables over the periods of the given frequency
+    (e.g. monthly), by column.
+    """
+    case = crud.case.get(db, id=case_id)
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+
+    variable_names = (
+        [v.strip() for v in variables.split(",") if v.strip()] if variables else None
+    )
+    summary = summaries.read_summary(
+        case.env["CASE_FOLDER_NAME"], frequency, variable_names
     )
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Summary not found")
+    return summary
@@ -1,48 +1,73 @@
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Set
 
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import parse_file_as
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from starlette.responses import Response
 
 from app import crud, schemas
-from app.core import settings
+from app.api.v1.dependencies import (
+    MAX_PAGE_SIZE,
+    get_case_cursor,
+    get_case_fields,
+    get_case_filters,
+    list_cases,
+)
 from app.db.session import get_db
+from app.utils.sites import site_registry
 
 router = APIRouter()
 
 
 def get_all_sites() -> schemas.FeatureCollection[schemas.SiteProperties]:
-    return (
-        parse_file_as(
-            schemas.FeatureCollection[schemas.SiteProperties], settings.SITES_PATH
-        )
-        if settings.SITES_PATH.exists()
-        else schemas.FeatureCollection[schemas.SiteProperties](features=[])
-    )
+    return site_registry.get_all()
 
 
 def get_site_by_name(site_name: str) -> Optional[schemas.SiteProperties]:
     """
     Return the site info for a given site name from `resources/config/sites.json`.
     """
-    sites = get_all_sites()
-    features = sites.features if sites else []
-    site = next(
-        filter(lambda f: f.properties and f.properties.name == site_name, features),
-        None,
-    )
-
-    if site:
-        return site.properties
-
-    return None
+    return site_registry.get(site_name)
 
 
 @router.get("/", response_model=schemas.FeatureCollection[schemas.SiteProperties])
-def get_sites() -> Any:
+def get_sites(
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=360),
+    count: int = Query(
+        1, ge=1, description="Number of nearest sites to return for lat and lon."
+    ),
+    bbox: Optional[str] = Query(
+        None, description="Comma separated min_lon,min_lat,max_lon,max_lat."
+    ),
+) -> Any:
     """
     Get all sites.
+
+    - If `lat` and `lon` are given, the `count` nearest sites are returned, nearest first.
+    - If `bbox` is given, the sites inside the bbox are returned.
     """
+    if (lat is None) != (lon is None):
+        raise HTTPException(status_code=400, detail="Both lat and lon are required")
+
+    if lat is not None and lon is not None:
+        if bbox:
+            raise HTTPException(
+                status_code=400, detail="Use either lat and lon, or bbox, not both"
+            )
+        return schemas.FeatureCollection[schemas.SiteProperties](
+            features=site_registry.get_nearest(lat, lon, count)
+        )
+
+    if bbox:
+        try:
+            (min_lon, min_lat, max_lon, max_lat) = [float(v) for v in bbox.split(",")]
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid bbox: {bbox}")
+        return schemas.FeatureCollection[schemas.SiteProperties](
+            features=site_registry.get_in_bbox((min_lon, min_lat, max_lon, max_lat)),
+            bbox=(min_lon, min_lat, max_lon, max_lat),
+        )
+
     return get_all_sites()
 
 
@@ -77,8 +102,9 @@ def create_site_case(
         name=site_case.site_name,
         case_id=case_task.id,
     )
-    site_cases = crud.site.get_site_cases(db=db, site_name=site_case.site_name)
-    existing_site_case = next((c for c in site_cases if c.id == case_task.id), None)
+    existing_site_case = crud.site.get_site_case(
+        db=db, site_name=site_case.site_name, case_id=case_task.id
+    )
     if not existing_site_case:
         crud.site.create(db=db, obj_in=obj_in)
     return case_task
@@ -87,10 +113,20 @@ def create_site_case(
 @router.get("/{site_name}/cases", response_model=List[schemas.CaseWithTaskInfo])
 def get_site_cases(
     site_name: str,
+    response: Response,
+    filters: schemas.CaseFilters = Depends(get_case_filters),
+    cursor: Optional[schemas.CaseCursor] = Depends(get_case_cursor),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[Set[str]] = Depends(get_case_fields),
     db: Session = Depends(get_db),
 ) -> Any:
     """
     Get all the cases for a site and given drivers.
     By default, all drivers are returned.
+
+    Results are paginated the same way as `/cases/`. The `site` filter is ignored.
     """
-    return crud.site.get_site_cases(db=db, site_name=site_name)
+    filters.site = site_name
+    return list_cases(
+        db, response, filters=filters, cursor=cursor, limit=limit, fields=fields
+    )
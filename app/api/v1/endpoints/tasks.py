@@ -1,17 +1,29 @@
-from typing import Any
+from typing import Any, List
 
 from fastapi import APIRouter
 
 from app import schemas
-from app.tasks.celery_app import celery_app
+from app.tasks.results import get_cached_tasks_meta
 
 router = APIRouter()
 
 
+@router.post("/status", response_model=List[schemas.Task])
+def get_tasks_status(tasks_in: schemas.TasksStatusRequest) -> Any:
+    """
+    Get the status of many tasks at once.
+    """
+    tasks_meta = get_cached_tasks_meta(tasks_in.task_ids)
+    return [
+        schemas.Task(**schemas.CaseWithTaskInfo.get_task_info(task_id, tasks_meta))
+        for task_id in tasks_meta
+    ]
+
+
 @router.get("/{task_id}", response_model=schemas.Task)
 def get_task(task_id: str) -> Any:
     """
     Get the status of a task.
     """
-    task = celery_app.AsyncResult(task_id)
-    return schemas.Task(task_id=task.task_id, status=task.status, result=task.result)
+    tasks_meta = get_cached_tasks_meta([task_id])
+    return schemas.Task(**schemas.CaseWithTaskInfo.get_task_info(task_id, tasks_meta))
@@ -1,15 +1,24 @@
-import os
+import json
 import shutil
+from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
+from celery import group, states
 from fastapi import UploadFile
-from sqlalchemy.orm import Session
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import JSON, String, and_, cast, func, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
 
 from app import models, schemas, tasks
 from app.core import settings
 from app.crud.base import CRUDBase
 from app.tasks.celery_app import celery_app
+from app.tasks.results import forget_task, get_tasks_meta
+from app.utils import archives, case_logs, site_data, summaries
 
 
 class CRUDCase(CRUDBase[models.CaseModel, schemas.CaseDBCreate, schemas.CaseDBUpdate]):
@@ -26,16 +35,194 @@ class CRUDCase(CRUDBase[models.CaseModel, schemas.CaseDBCreate, schemas.CaseDBUp
         )
 
     def get_all_cases_with_site(
-        self, db: Session
+        self,
+        db: Session,
+        *,
+        filters: Optional[schemas.CaseFilters] = None,
+        cursor: Optional[schemas.CaseCursor] = None,
+        limit: Optional[int] = None,
+        fields: Optional[Set[str]] = None,
     ) -> List[Tuple[models.CaseModel, Optional[str]]]:
+        """Get the cases and their sites.
+        Pages (with a cursor or a limit) are sorted by creation date and id,
+        and the whole list is sorted by id.
+
+        Parameters
+        ----------
+        db : Session
+            The database session.
+        filters : Optional[schemas.CaseFilters]
+            Only return the cases matching all the given filters.
+        cursor : Optional[schemas.CaseCursor]
+            Only return the cases after the given cursor.
+        limit : Optional[int]
+            The maximum number of cases to return.
+        fields : Optional[Set[str]]
+            If given, only these columns are loaded from the cases table.
+            Other columns are loaded on access.
+
+        Returns
+        -------
+        List[Tuple[models.CaseModel, Optional[str]]]
+            A list of cases and their site names.
+        """
+        query = db.query(self.model, models.SiteCaseModel.name).outerjoin(
+            models.SiteCaseModel, models.SiteCaseModel.case_id == self.model.id
+        )
+
+        if filters:
+            if filters.status:
+                query = query.filter(self.model.status.in_(filters.status))
+            if filters.site:
+                query = query.filter(models.SiteCaseModel.name == filters.site)
+            if filters.compset:
+                query = query.filter(self.model.compset == filters.compset)
+            if filters.driver:
+                query = query.filter(self.model.driver == filters.driver)
+            # date_created is stored as an ISO format naive local time,
+            # so it can be compared as a string in the same format.
+            if filters.created_after:
+                query = query.filter(
+                    self.model.date_created >= filters.created_after.isoformat()
+                )
+            if filters.created_before:
+                query = query.filter(
+                    self.model.date_created < filters.created_before.isoformat()
+                )
+
+        if cursor:
+            query = query.filter(
+                or_(
+                    self.model.date_created > cursor.date_created,
+                    and_(
+                        self.model.date_created == cursor.date_created,
+                        self.model.id > cursor.id,
+                    ),
+                )
+            )
+
+        if fields is not None:
+            columns = {
+                "date_created",
+                "create_task_id",
+                "run_task_id",
+                *(f for f in fields if f in self.model.__table__.columns),
+            }
+            query = query.options(
+                load_only(*(getattr(self.model, column) for column in columns))
+            )
+
+        if cursor or limit:
+            query = query.order_by(self.model.date_created, self.model.id)
+            if limit:
+                query = query.limit(limit)
+        else:
+            query = query.order_by(self.model.id)
+
+        return query.all()
+
+    def set_status(
+        self,
+        db: Session,
+        *,
+        id: str,
+        status: schemas.CaseCreateStatus | schemas.CaseRunStatus,
+        step: Optional[str] = None,
+        duration: Optional[float] = None,
+    ) -> None:
+        """
+        Change the status of a case and record the change in its events,
+        without loading the case.
+        """
+        db.execute(update(self.model).where(self.model.id == id).values(status=status))
+        db.add(
+            models.CaseEventModel(
+                case_id=id,
+                status=status,
+                step=step,
+                duration=duration,
+                date_created=datetime.now().isoformat(),
+            )
+        )
+        db.commit()
+
+    def set_step_state(
+        self, db: Session, *, id: str, step: str, state: models.CaseStepState
+    ) -> None:
+        """
+        Set the state of a step of a case in a single UPDATE,
+        so the states of steps updated at the same time are not overwritten.
+        """
+        steps: Any
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            steps = func.json_set(
+                self.model.steps,
+                f'$."{step}"',
+                func.json(json.dumps(state)),
+            )
+        elif dialect == "postgresql":
+            steps = cast(
+                cast(self.model.steps, JSONB).op("||")(cast({step: state}, JSONB)),
+                JSON,
+            )
+        else:
+            case = (
+                db.query(self.model).filter(self.model.id == id).with_for_update().one()
+            )
+            steps = {**case.steps, step: state}
+        db.execute(update(self.model).where(self.model.id == id).values(steps=steps))
+        db.commit()
+
+    def remove_step_states(self, db: Session, *, id: str, steps: List[str]) -> None:
+        """Remove the state of the given steps of a case in a single UPDATE."""
+        new_steps: Any
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            new_steps = func.json_remove(self.model.steps, *(f'$."{s}"' for s in steps))
+        elif dialect == "postgresql":
+            jsonb_steps: Any = cast(self.model.steps, JSONB)
+            for step in steps:
+                jsonb_steps = jsonb_steps.op("-")(literal(step, String))
+            new_steps = cast(jsonb_steps, JSON)
+        else:
+            case = (
+                db.query(self.model).filter(self.model.id == id).with_for_update().one()
+            )
+            new_steps = {k: v for (k, v) in case.steps.items() if k not in steps}
+        db.execute(
+            update(self.model).where(self.model.id == id).values(steps=new_steps)
+        )
+        db.commit()
+
+    def get_events(self, db: Session, *, id: str) -> List[models.CaseEventModel]:
+        """Get the status changes of a case, in the order they happened."""
         return (
-            db.query(self.model, models.SiteCaseModel.name)
+            db.query(models.CaseEventModel)
+            .filter(models.CaseEventModel.case_id == id)
+            .order_by(models.CaseEventModel.id)
+            .all()
+        )
+
+    async def get_status_counts(
+        self, db: AsyncSession
+    ) -> List[schemas.CaseStatusCount]:
+        """Count the cases by site and status."""
+        result = await db.execute(
+            select(
+                models.SiteCaseModel.name, self.model.status, func.count(self.model.id)
+            )
+            .select_from(self.model)
             .outerjoin(
                 models.SiteCaseModel, models.SiteCaseModel.case_id == self.model.id
             )
-            .order_by(self.model.id)
-            .all()
+            .group_by(models.SiteCaseModel.name, self.model.status)
+            .order_by(models.SiteCaseModel.name, self.model.status)
         )
+        return [
+            schemas.CaseStatusCount(site=site, status=status, count=count)
+            for (site, status, count) in result
+        ]
 
     def create(
         self,
@@ -44,24 +231,146 @@ class CRUDCase(CRUDBase[models.CaseModel, schemas.CaseDBCreate, schemas.CaseDBUp
         obj_in: Union[schemas.CaseBase, Dict[str, Any]],
         data_file: UploadFile | None = None,
     ) -> models.CaseModel:
+        """
+        Create the case and send its create task, which starts by ingesting its data.
+        Requests for a case that is already being created return the existing case.
+        """
         assert isinstance(obj_in, schemas.CaseBase)
-        obj_in.validate_data_file(data_file)
+        obj_in.data_digest = schemas.CaseBase.stage_data(obj_in.data_url, data_file)
+        obj_in.status = schemas.CaseCreateStatus.INGESTING
+        obj_in.set_id()
 
-        data = schemas.CaseDBCreate(
-            **(obj_in.dict() if isinstance(obj_in, schemas.CaseBase) else obj_in)
-        )
+        data = schemas.CaseDBCreate(**obj_in.dict())
         case_id = data.id
         existing_case = self.get(db, id=case_id)
+        if not existing_case and obj_in.data_url:
+            existing_case = self.get_digest_case(db, obj_in=obj_in)
 
-        if existing_case:
-            if existing_case.status != schemas.TaskStatus.FAILURE:
-                return existing_case
+        if not existing_case:
+            try:
+                new_case = super().create(db, obj_in=data)
+            except IntegrityError:
+                # The same case was created by a concurrent request.
+                db.rollback()
+                existing_case = self.get(db, id=case_id)
+                assert existing_case
+            else:
+                task = tasks.create_case.delay(new_case.id)
+                return self.update(
+                    db, db_obj=new_case, obj_in={"create_task_id": task.id}
+                )
 
-            self.remove(db, id=case_id)
+        create_task_id = existing_case.create_task_id or ""
+        create_task_meta = get_tasks_meta([create_task_id]).get(create_task_id, {})
+        if create_task_meta.get("status") != schemas.TaskStatus.FAILURE:
+            return existing_case
+
+        # Resume the creation from the step that failed.
+        task = tasks.create_case.delay(existing_case.id)
+        return self.update(db, db_obj=existing_case, obj_in={"create_task_id": task.id})
+
+    def get_digest_case(
+        self, db: Session, *, obj_in: schemas.CaseBase
+    ) -> Optional[models.CaseModel]:
+        """
+        Get the case created for the same URL and arguments when case ids hashed
+        the digest of the data of the URL, with the digest of its last fetched data.
+        """
+        assert obj_in.data_url
+        digest = site_data.get_cached_digest(obj_in.data_url)
+        if not digest:
+            return None
+
+        digest_case = obj_in.copy(
+            update={"data_url": None, "data_digest": digest}, deep=True
+        )
+        digest_case.set_id()
+        existing_case = self.get(db, id=digest_case.id)
+        if existing_case and existing_case.data_url == obj_in.data_url:
+            return existing_case
+        return None
+
+    def create_ensemble(
+        self,
+        db: Session,
+        *,
+        obj_in: schemas.CaseEnsembleCreate,
+        data_file: UploadFile | None = None,
+    ) -> schemas.CaseEnsemble:
+        """
+        Create the cases of an ensemble in a single transaction.
+        Uploaded data is read once for all the cases, the create tasks ingest it,
+        and cases that already exist are skipped.
+        The creation tasks are sent as a group, whose id identifies the ensemble.
+        """
+        members = obj_in.get_members()
+        digest = schemas.CaseBase.stage_data(obj_in.base.data_url, data_file)
+        for member in members:
+            member.data_digest = digest
+            member.status = schemas.CaseCreateStatus.INGESTING
+            member.set_id()
+
+        member_ids = list(dict.fromkeys(member.id for member in members))
+        existing_ids = {
+            case_id
+            for (case_id,) in db.query(self.model.id).filter(
+                self.model.id.in_(member_ids)
+            )
+        }
 
-        new_case = super().create(db, obj_in=data)
-        task = tasks.create_case.delay(new_case)
-        return self.update(db, db_obj=new_case, obj_in={"create_task_id": task.id})
+        new_members: Dict[str, schemas.CaseBase] = {}
+        for member in members:
+            if member.id not in existing_ids:
+                new_members.setdefault(member.id, member)
+
+        db.add_all(
+            [
+                self.model(**jsonable_encoder(schemas.CaseDBCreate(**member.dict())))
+                for member in new_members.values()
+            ]
+        )
+        db.commit()
+
+        # Load the new cases in one query, to set the ids of their tasks.
+        new_cases = (
+            db.query(self.model).filter(self.model.id.in_(list(new_members))).all()
+        )
+        group_result = group(
+            [tasks.create_case.s(case.id) for case in new_cases]
+        ).apply_async()
+        group_result.save()
+        for case, task_result in zip(new_cases, group_result.results):
+            case.create_task_id = task_result.id
+        db.commit()
+
+        return schemas.CaseEnsemble(
+            id=group_result.id,
+            case_ids=[case.id for case in new_cases],
+            skipped_case_ids=sorted(existing_ids),
+        )
+
+    def get_ensemble(self, db: Session, *, id: str) -> Optional[schemas.CaseEnsemble]:
+        group_result = celery_app.GroupResult.restore(id)
+        if not group_result:
+            return None
+
+        task_ids = [task_result.id for task_result in group_result.results]
+        tasks_meta = get_tasks_meta(task_ids)
+        task_counts: Dict[schemas.TaskStatus, int] = {}
+        for task_id in task_ids:
+            status = tasks_meta.get(task_id, {}).get("status", states.PENDING)
+            task_counts[status] = task_counts.get(status, 0) + 1
+
+        return schemas.CaseEnsemble(
+            id=id,
+            case_ids=[
+                case_id
+                for (case_id,) in db.query(self.model.id)
+                .filter(self.model.create_task_id.in_(task_ids))
+                .order_by(self.model.id)
+            ],
+            task_counts=task_counts,
+        )
 
     def remove(self, db: Session, *, id: str) -> Optional[models.CaseModel]:  # type: ignore[override]
         existing_case_and_site = self.get_case_with_site(db, id=id)
@@ -72,20 +381,25 @@ class CRUDCase(CRUDBase[models.CaseModel, schemas.CaseDBCreate, schemas.CaseDBUp
             if case_path.exists():
                 shutil.rmtree(case_path)
 
-            archive_path = (
-                settings.ARCHIVES_ROOT / f"{existing_case.env['CASE_FOLDER_NAME']}.zip"
-            )
-            if archive_path.exists():
-                os.remove(archive_path)
+            archives.remove_stale_archives(existing_case.env["CASE_FOLDER_NAME"])
+
+            logs_path = case_logs.get_logs_path(existing_case.env["CASE_FOLDER_NAME"])
+            if logs_path.exists():
+                shutil.rmtree(logs_path)
+
+            summaries.remove_summaries(existing_case.env["CASE_FOLDER_NAME"])
 
             case_data_root = Path(existing_case.env["CASE_DATA_ROOT"])
             if case_data_root.exists():
                 shutil.rmtree(case_data_root)
+            site_data.release_data(
+                existing_case.data_digest, existing_case.env["CASE_FOLDER_NAME"]
+            )
 
             if existing_case.create_task_id:
-                celery_app.AsyncResult(existing_case.create_task_id).forget()
+                forget_task(existing_case.create_task_id)
             if existing_case.run_task_id:
-                celery_app.AsyncResult(existing_case.run_task_id).forget()
+                forget_task(existing_case.run_task_id)
 
         return super().remove(db, id=id)
 
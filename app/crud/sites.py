@@ -1,12 +1,10 @@
-from typing import List
+from typing import List, Optional
 
 from sqlalchemy.orm import Session
 
 from app import models, schemas
 from app.crud.base import CRUDBase
 
-from .cases import case as crud_case
-
 
 class CRUDSite(
     CRUDBase[models.SiteCaseModel, schemas.SiteCaseDBCreate, schemas.SiteCaseDBUpdate]
@@ -14,18 +12,24 @@ class CRUDSite(
     def get_site_cases(
         self, db: Session, *, site_name: str
     ) -> List[schemas.CaseWithTaskInfo]:
-        site_cases = db.query(self.model).filter_by(name=site_name)
-        site_cases_with_task_info = []
-        for site_case in site_cases:
-            case_and_site = crud_case.get_case_with_site(db, id=site_case.case_id)
-            if case_and_site:
-                (case, _) = case_and_site
-                site_case_with_task_info = (
-                    schemas.CaseWithTaskInfo.get_case_with_task_info(case, site_name)
-                )
-                if site_case_with_task_info:
-                    site_cases_with_task_info.append(site_case_with_task_info)
-        return site_cases_with_task_info
+        cases_and_sites = (
+            db.query(models.CaseModel, self.model.name)
+            .join(self.model, self.model.case_id == models.CaseModel.id)
+            .filter(self.model.name == site_name)
+            .order_by(models.CaseModel.id)
+            .all()
+        )
+        return schemas.CaseWithTaskInfo.get_cases_with_task_info(cases_and_sites)
+
+    def get_site_case(
+        self, db: Session, *, site_name: str, case_id: str
+    ) -> Optional[models.SiteCaseModel]:
+        """Get the link of a case to a site, without loading the cases of the site."""
+        return (
+            db.query(self.model)
+            .filter(self.model.name == site_name, self.model.case_id == case_id)
+            .first()
+        )
 
 
 site = CRUDSite(models.SiteCaseModel)
@@ -1,22 +1,101 @@
-from typing import Generator
+"""
+Database engines and sessions.
 
-from sqlalchemy import create_engine, text
+SQLite connections are set up once when they are opened, through an engine event:
+WAL lets the API read while workers write, busy_timeout makes writers wait for
+the lock instead of failing with `database is locked`, and synchronous=NORMAL
+is safe with WAL while syncing less often.
+Other databases (e.g. PostgreSQL) use a pool sized by the database settings.
+
+The async session (`get_async_db`) uses the async driver of the same database
+(aiosqlite or asyncpg), so API endpoints can query without holding a thread.
+"""
+from typing import Any, AsyncGenerator, Dict, Generator
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio.engine import AsyncEngine
 from sqlalchemy.orm import sessionmaker
 
 from app.core import settings
 
-engine = create_engine(
-    str(settings.SQLALCHEMY_DATABASE_URI),
-    pool_pre_ping=True,
-    connect_args={"check_same_thread": False},
-)
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def is_sqlite(database_uri: str) -> bool:
+    return make_url(database_uri).get_backend_name() == "sqlite"
+
+
+def set_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT * 1000}")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def get_engine_options(database_uri: str) -> Dict[str, Any]:
+    if is_sqlite(database_uri):
+        return {
+            "connect_args": {
+                "check_same_thread": False,
+                "timeout": settings.SQLITE_BUSY_TIMEOUT,
+            }
+        }
+    return {
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+    }
+
+
+def get_async_database_uri(database_uri: str) -> str:
+    url = make_url(database_uri)
+    async_driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if not async_driver:
+        raise ValueError(f"No async driver for {url.get_backend_name()}")
+    return str(url.set(drivername=f"{url.get_backend_name()}+{async_driver}"))
+
+
+def create_db_engine(database_uri: str) -> Engine:
+    db_engine = create_engine(
+        database_uri, pool_pre_ping=True, **get_engine_options(database_uri)
+    )
+    if is_sqlite(database_uri):
+        event.listen(db_engine, "connect", set_sqlite_pragmas)
+    return db_engine
+
+
+def create_async_db_engine(database_uri: str) -> AsyncEngine:
+    db_engine = create_async_engine(
+        get_async_database_uri(database_uri),
+        pool_pre_ping=True,
+        **get_engine_options(database_uri),
+    )
+    if is_sqlite(database_uri):
+        event.listen(db_engine.sync_engine, "connect", set_sqlite_pragmas)
+    return db_engine
+
+
+engine = create_db_engine(settings.SQLALCHEMY_DATABASE_URI)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_db_engine(settings.SQLALCHEMY_DATABASE_URI)
+AsyncSessionLocal = sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 
 def get_db() -> Generator:
     try:
         db = SessionLocal()
-        db.execute(text("PRAGMA foreign_keys=ON"))
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,13 +1,17 @@
+import time
 from typing import Awaitable, Callable
 
 import pydantic
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST
 from starlette.requests import Request
 from starlette.responses import Response
 
 from app.api.v1.api import api_router
+from app.api.v1.dependencies import NEXT_CURSOR_HEADER
 from app.core import settings
+from app.utils import metrics
 from app.utils.dependencies import setup_ctsm, setup_model
 from app.utils.logger import logger
 
@@ -31,7 +35,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"],
+    expose_headers=[
+        "Accept-Ranges",
+        "Content-Disposition",
+        "Content-Range",
+        "ETag",
+        "X-Log-Offset",
+        "X-Log-Size",
+        NEXT_CURSOR_HEADER,
+    ],
 )
 
 
@@ -60,6 +72,30 @@ async def catch_exceptions_middleware(
         return Response("Internal server error", status_code=500, headers=error_headers)
 
 
+async def metrics_middleware(
+    request: Request, call_next: Callable[[Request], Awaitable[Response]]
+) -> Response:
+    """
+    Record the request durations by route template, to keep the number of label values bounded.
+    """
+    start = time.time()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.observe_request(
+        request.method,
+        getattr(route, "path", "unmatched"),
+        response.status_code,
+        time.time() - start,
+    )
+    return response
+
+
 app.middleware("http")(catch_exceptions_middleware)
+app.middleware("http")(metrics_middleware)
 
 app.include_router(api_router, prefix=settings.API_V1)
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics() -> Response:
+    return Response(metrics.get_metrics(), media_type=CONTENT_TYPE_LATEST)
@@ -1,5 +1,6 @@
 """
 Database models for the application.
 """
-from .cases import CaseModel
+from .cases import CaseModel, CaseStepState
+from .events import CaseEventModel
 from .sites import SiteCaseModel
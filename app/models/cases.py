@@ -1,6 +1,6 @@
 from typing import Dict, List, Optional, TypedDict
 
-from sqlalchemy import JSON, Column, Float, String
+from sqlalchemy import JSON, Column, Float, Index, String
 
 from app.db.base_class import Base
 from app.schemas.constants import VariableValue
@@ -11,22 +11,33 @@ class CaseVariable(TypedDict):
     value: VariableValue
 
 
+class CaseStepState(TypedDict, total=False):
+    status: str
+    attempts: int
+    error: Optional[str]
+    date_updated: str
+
+
 class CaseModel(Base):
     __tablename__ = "cases"
+    __table_args__ = (Index("ix_cases_date_created_id", "date_created", "id"),)
 
     id: str = Column(String(32), primary_key=True, index=True)
     name: str = Column(String(300), nullable=True)
-    compset: str = Column(String(300), nullable=False)
+    compset: str = Column(String(300), nullable=False, index=True)
     lat: Optional[float] = Column(Float, nullable=True)
     lon: Optional[float] = Column(Float, nullable=True)
     variables: List[CaseVariable] = Column(JSON(), nullable=False)
     fates_indices: Optional[str] = Column(String(300), nullable=True)
     data_url: Optional[str] = Column(String(300), nullable=True)
     data_digest: str = Column(String(300), nullable=False)
-    driver: str = Column(String(5), nullable=False)
+    driver: str = Column(String(5), nullable=False, index=True)
     model_version: str = Column(String(20), nullable=False)
     env: Dict[str, str] = Column(JSON(), nullable=False, default={})
-    status: str = Column(String(20), nullable=False)
+    status: str = Column(String(20), nullable=False, index=True)
     date_created: str = Column(String(30), nullable=False)
     create_task_id: Optional[str] = Column(String(20), nullable=True)
     run_task_id: Optional[str] = Column(String(20), nullable=True)
+    steps: Dict[str, CaseStepState] = Column(
+        JSON(), nullable=False, default={}, server_default="{}"
+    )
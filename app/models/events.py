@@ -0,0 +1,21 @@
+from typing import Optional
+
+from sqlalchemy import Column, Float, ForeignKey, Index, Integer, String
+
+from app.db.base_class import Base
+
+
+class CaseEventModel(Base):
+    """A status change of a case, appended when it happens."""
+
+    __tablename__ = "case_events"
+    __table_args__ = (Index("ix_case_events_case_id_id", "case_id", "id"),)
+
+    id: int = Column(Integer(), primary_key=True)
+    case_id: str = Column(
+        String(32), ForeignKey("cases.id", ondelete="CASCADE"), nullable=False
+    )
+    status: str = Column(String(20), nullable=False)
+    step: Optional[str] = Column(String(50), nullable=True)
+    duration: Optional[float] = Column(Float, nullable=True)
+    date_created: str = Column(String(30), nullable=False)
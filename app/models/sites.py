@@ -1,14 +1,18 @@
-from sqlalchemy import Column, ForeignKey, Integer, String
+from sqlalchemy import Column, ForeignKey, Index, Integer, String
 
 from app.db.base_class import Base
 
 
 class SiteCaseModel(Base):
     __tablename__ = "case_sites"
+    __table_args__ = (Index("ix_case_sites_name_case_id", "name", "case_id"),)
 
     id: int = Column(Integer(), primary_key=True, index=True)
     name: str = Column(String(300), nullable=False)
     case_id: str = Column(
-        String(32), ForeignKey("cases.id", ondelete="CASCADE"), nullable=False
+        String(32),
+        ForeignKey("cases.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
     )
     date_created: str = Column(String(30), nullable=False)
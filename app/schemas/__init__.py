@@ -1,8 +1,17 @@
 from .cases import (
     Case,
     CaseBase,
+    CaseCursor,
     CaseDBCreate,
     CaseDBUpdate,
+    CaseEnsemble,
+    CaseEnsembleCreate,
+    CaseEvent,
+    CaseFilters,
+    CaseLog,
+    CasePartial,
+    CaseStatusCount,
+    CaseStep,
     CaseVariable,
     CaseVariableConfig,
     CaseWithTaskInfo,
@@ -13,6 +22,13 @@ from .cases import (
 )
 from .constants import CaseCreateStatus, CaseRunStatus
 from .geojson import Feature, FeatureCollection, Point
+from .history import (
+    HistoryFile,
+    HistoryFormat,
+    HistorySummary,
+    HistoryTape,
+    HistoryVariable,
+)
 from .sites import (
     SiteCaseCreate,
     SiteCaseDB,
@@ -20,4 +36,4 @@ from .sites import (
     SiteCaseDBUpdate,
     SiteProperties,
 )
-from .tasks import Task, TaskStatus
+from .tasks import Task, TasksStatusRequest, TaskStatus
@@ -1,26 +1,55 @@
+import base64
+import binascii
 import hashlib
-import io
+import itertools
 import json
 import re
-import shutil
+import tempfile
+from contextlib import contextmanager
 from datetime import datetime
 from functools import lru_cache
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Dict, Generator, List, Optional, Union, cast
-from zipfile import ZipFile
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 
 import requests
 from fastapi import UploadFile
-from pydantic import BaseModel, Field, parse_file_as, root_validator
+from pydantic import (
+    BaseModel,
+    Field,
+    ValidationError,
+    parse_file_as,
+    root_validator,
+    validator,
+)
 from slugify import slugify
 
 from app.core import settings
-from app.tasks.celery_app import celery_app
+from app.tasks.results import get_tasks_meta
+from app.utils import site_data
+from app.utils.locks import file_lock
+from app.utils.logger import logger
 
 from .constants import (
     CaseCreateStatus,
     CaseRunStatus,
     ModelDriver,
+    TaskStatus,
     VariableCategory,
     VariableType,
     VariableValue,
@@ -30,6 +59,8 @@ from .tasks import Task
 if TYPE_CHECKING:
     from app.models import CaseModel
 
+DATA_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
 
 class ModelInfo(BaseModel):
     model: str
@@ -83,25 +114,164 @@ class CaseVariableConfig(BaseModel):
         smart_union = True
 
     @classmethod
-    @lru_cache()
     def get_variables_config(cls) -> List["CaseVariableConfig"]:
-        return (
-            parse_file_as(List[CaseVariableConfig], settings.VARIABLES_CONFIG_PATH)
-            if settings.VARIABLES_CONFIG_PATH.exists()
-            else []
-        )
+        return get_compiled_variables_config().variables_config
 
     @classmethod
-    @lru_cache()
     def get_variable_config(cls, variable_name: str) -> Optional["CaseVariableConfig"]:
-        return next(
-            (
-                variable_config
-                for variable_config in cls.get_variables_config()
-                if variable_config.name == variable_name
-            ),
-            None,
+        return get_compiled_variables_config().by_name.get(variable_name)
+
+
+ScalarValue = Union[int, float, str, bool]
+
+# Coercion of the values of each variable type.
+VARIABLE_TYPE_COERCERS: Dict[VariableType, Callable[[Any], ScalarValue]] = {
+    VariableType.char: str,
+    VariableType.date: str,
+    VariableType.integer: int,
+    VariableType.float: float,
+    VariableType.logical: bool,
+}
+
+VARIABLE_TYPE_NAMES = {
+    VariableType.char: "string",
+    VariableType.date: "string",
+    VariableType.integer: "integer",
+    VariableType.float: "float",
+    VariableType.logical: "boolean",
+}
+
+
+class CaseVariableValidator:
+    """
+    The validation of a variable, compiled once from its config:
+    choices are kept in a set, the pattern is compiled,
+    and the coercion of its type is looked up.
+    """
+
+    def __init__(self, variable_config: CaseVariableConfig):
+        self.name = variable_config.name
+        self.allow_multiple = variable_config.allow_multiple
+        self.coerce = VARIABLE_TYPE_COERCERS.get(variable_config.type)
+        self.type_name = VARIABLE_TYPE_NAMES.get(variable_config.type)
+
+        validation = variable_config.validation
+        self.choices: Optional[Set[Any]] = None
+        self.min: Optional[Union[int, float]] = None
+        self.max: Optional[Union[int, float]] = None
+        self.pattern: Optional[re.Pattern] = None
+        self.pattern_error: Optional[str] = None
+        if validation and not variable_config.allow_custom and validation.choices:
+            self.choices = {
+                choice.value
+                for choice in validation.choices
+                if not isinstance(choice.value, list)
+            }
+        elif validation:
+            self.min = validation.min
+            self.max = validation.max
+            self.pattern = (
+                re.compile(validation.pattern) if validation.pattern else None
+            )
+            self.pattern_error = validation.pattern_error
+
+    def validate_value(self, value: Any, raw_value: Any) -> ScalarValue:
+        if self.coerce is None:
+            raise ValueError(f"Variable {self.name} is not valid.")
+        try:
+            validated_value = self.coerce(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Variable {self.name} is not valid {self.type_name}.")
+
+        if self.choices is not None:
+            if validated_value not in self.choices:
+                raise ValueError(f"{raw_value} is not a valid choice for {self.name}.")
+            return validated_value
+
+        is_number = isinstance(validated_value, (int, float)) and not isinstance(
+            validated_value, bool
         )
+        # Only compared when it is a number.
+        number = cast(float, validated_value)
+        if self.min is not None and (not is_number or number < self.min):
+            raise ValueError(f"{raw_value} is less than minimum value for {self.name}.")
+        if self.max is not None and (not is_number or number > self.max):
+            raise ValueError(
+                f"{raw_value} is greater than maximum value for {self.name}."
+            )
+        if self.pattern and (
+            not isinstance(validated_value, str)
+            or not self.pattern.match(validated_value)
+        ):
+            raise ValueError(
+                self.pattern_error
+                or f"{raw_value} does not match pattern for {self.name}."
+            )
+        return validated_value
+
+    def validate(self, raw_value: VariableValue) -> VariableValue:
+        """
+        Return the validated value of the variable.
+
+        Raises
+        ------
+        ValueError
+            If the value is not valid.
+        """
+        value: Any = raw_value
+        if self.name == "included_pft_indices":
+            fates_indices = value.split(",") if isinstance(value, str) else value
+            try:
+                value = [int(str(index).strip()) for index in fates_indices]
+            except ValueError:
+                raise ValueError(f"Invalid fates index: {raw_value}")
+
+        if not isinstance(value, list):
+            value = [value]
+        elif not self.allow_multiple and len(value) > 1:
+            raise ValueError(
+                f"Variable {self.name} is not allowed to have multiple values."
+            )
+
+        validated_values = [self.validate_value(v, raw_value) for v in value]
+        if self.allow_multiple:
+            return cast(VariableValue, validated_values)
+        if not validated_values:
+            raise ValueError(f"Variable {self.name} is not valid.")
+        return validated_values[0]
+
+
+class CompiledVariablesConfig:
+    def __init__(self, variables_config: List[CaseVariableConfig]):
+        self.variables_config = variables_config
+        self.by_name = {
+            variable_config.name: variable_config
+            for variable_config in variables_config
+        }
+        self.validators = {
+            variable_config.name: CaseVariableValidator(variable_config)
+            for variable_config in variables_config
+        }
+
+
+@lru_cache(maxsize=1)
+def compile_variables_config(mtime_ns: Optional[int]) -> CompiledVariablesConfig:
+    return CompiledVariablesConfig(
+        parse_file_as(List[CaseVariableConfig], settings.VARIABLES_CONFIG_PATH)
+        if mtime_ns is not None
+        else []
+    )
+
+
+def get_compiled_variables_config() -> CompiledVariablesConfig:
+    """
+    Return the variables config, compiled again when the config file changes.
+    """
+    try:
+        mtime_ns: Optional[int] = settings.VARIABLES_CONFIG_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = None
+    return compile_variables_config(mtime_ns)
 
 
 class CaseVariable(BaseModel):
@@ -166,7 +336,10 @@ class CaseBase(BaseModel):
                 json.dumps(list(map(lambda v: v.dict(), self.variables))),
                 self.driver,
                 self.model_version,
-                self.data_digest,
+                # The data of a URL is only fetched by the create task,
+                # so its digest is not known yet. The case takes the data
+                # served at the URL each time its data is ingested.
+                self.data_url or self.data_digest,
             ]
         )
         self.id = hashlib.md5(bytes(hash_parts.encode("utf-8"))).hexdigest()
@@ -198,123 +371,22 @@ class CaseBase(BaseModel):
             validated_variables = []
             errors = None
 
+            validators = get_compiled_variables_config().validators
+
             for variable in variables:
                 if variable.name == "user_nl_clm_extra":
                     validated_variables.append(variable)
                     continue
 
-                variable_config = CaseVariableConfig.get_variable_config(variable.name)
-
-                if not variable_config:
+                variable_validator = validators.get(variable.name)
+                if not variable_validator:
                     continue
 
-                value = variable.value
-
-                if variable_config.name == "included_pft_indices":
-                    fates_indices = cast(
-                        List[str], value.split(",") if isinstance(value, str) else value
-                    )
-                    try:
-                        value = [int(index.strip()) for index in fates_indices]
-                    except ValueError:
-                        errors = "Invalid fates index: {}".format(value)
-                        continue
-
-                if variable_config.allow_multiple:
-                    if not isinstance(value, list):
-                        value = [value]
-                else:
-                    if isinstance(value, list):
-                        if len(value) > 1:
-                            errors = f"Variable {variable.name} is not allowed to have multiple values."
-                            continue
-                    else:
-                        value = [value]
-
-                assert isinstance(value, list)
-
-                validated_values = []
-                for v in value:
-                    validated_value: Optional[Union[int, float, str, bool]] = None
-                    if variable_config.type == "char" or variable_config.type == "date":
-                        try:
-                            validated_value = str(v)
-                        except ValueError:
-                            errors = f"Variable {variable.name} is not valid string."
-                            continue
-                    elif variable_config.type == "integer":
-                        try:
-                            validated_value = int(v)
-                        except ValueError:
-                            errors = f"Variable {variable.name} is not valid integer"
-                            continue
-                    elif variable_config.type == "float":
-                        try:
-                            validated_value = float(v)
-                        except ValueError:
-                            errors = f"Variable {variable.name} is not valid float"
-                            continue
-                    elif variable_config.type == "logical":
-                        try:
-                            validated_value = bool(v)
-                        except ValueError:
-                            errors = f"Variable {variable.name} is not valid boolean"
-                            continue
-
-                    if validated_value is None:
-                        errors = f"Variable {variable.name} is not valid."
-                        continue
-
-                    if variable_config.validation:
-                        if (
-                            not variable_config.allow_custom
-                            and variable_config.validation.choices
-                        ):
-                            if not next(
-                                filter(
-                                    lambda c: c.value == validated_value,  # noqa: B023
-                                    variable_config.validation.choices,
-                                ),
-                                None,
-                            ):
-                                errors = f"{variable.value} is not a valid choice for {variable.name}."
-                                continue
-                        else:
-                            if variable_config.validation.min:
-                                if (
-                                    type(validated_value) != int
-                                    or type(validated_value) != float
-                                    or validated_value < variable_config.validation.min
-                                ):
-                                    errors = f"{variable.value} is less than minimum value for {variable.name}."
-                                    continue
-                            if variable_config.validation.max:
-                                if (
-                                    type(validated_value) != int
-                                    or type(validated_value) != float
-                                    or validated_value > variable_config.validation.max
-                                ):
-                                    errors = f"{variable.value} is greater than maximum value for {variable.name}."
-                                    continue
-                            if variable_config.validation.pattern:
-                                if type(validated_value) != str or not re.match(
-                                    variable_config.validation.pattern, validated_value
-                                ):
-                                    if variable_config.validation.pattern_error:
-                                        errors = (
-                                            variable_config.validation.pattern_error
-                                        )
-                                    else:
-                                        errors = f"{variable.value} does not match pattern for {variable.name}."
-                                    continue
-
-                    validated_values.append(validated_value)
-
-                variable.value = (
-                    validated_values
-                    if variable_config.allow_multiple
-                    else validated_values[0]
-                )
+                try:
+                    variable.value = variable_validator.validate(variable.value)
+                except ValueError as e:
+                    errors = str(e)
+                    continue
                 validated_variables.append(variable)
 
             if errors:
@@ -328,39 +400,158 @@ class CaseBase(BaseModel):
 
         return values
 
-    def validate_data_file(self, data_file: UploadFile | None) -> None:
-        if data_file and self.data_url:
+    @staticmethod
+    @contextmanager
+    def fetch_data(
+        data_url: Optional[str], data_file: UploadFile | None
+    ) -> Iterator[Tuple[Optional[IO[bytes]], str]]:
+        """
+        Download (or read) the data zip file into a temporary file.
+        Data from a URL is not downloaded again if it did not change since it was stored.
+
+        Yields
+        ------
+        Tuple[Optional[IO[bytes]], str]
+            The temporary file, or None if the data is already stored,
+            and the md5 digest of its content.
+        """
+        if data_file and data_url:
             raise ValueError(
                 "You must provide either a data file or the data_url attribute, not both."
             )
 
-        if self.data_url:
-            response = requests.get(self.data_url, stream=True)
-            content_type = response.headers.get("content-type", "")
-            data_file_obj = response.raw.read()
-        elif data_file:
-            content_type = data_file.content_type
-            data_file_obj = data_file.file.read()
-        else:
+        with tempfile.TemporaryFile() as data_file_obj:
+            if data_url:
+                response = requests.get(
+                    data_url,
+                    stream=True,
+                    headers=site_data.get_conditional_headers(data_url),
+                )
+                cached_digest = site_data.get_cached_digest(data_url)
+                if response.status_code == 304 and cached_digest:
+                    response.close()
+                    yield (None, cached_digest)
+                    return
+                response.raise_for_status()
+                content_type = response.headers.get("content-type", "")
+                # The data is hashed as it is served, without decoding its
+                # Content-Encoding, as `response.raw.read()` did.
+                chunks: Iterable[bytes] = response.raw.stream(
+                    DATA_CHUNK_SIZE, decode_content=False
+                )
+            elif data_file:
+                content_type = data_file.content_type
+                upload = data_file.file
+                chunks = iter(lambda: upload.read(DATA_CHUNK_SIZE), b"")
+            else:
+                raise ValueError(
+                    "You must provide either a data file or the data_url attribute."
+                )
+
+            if "zip" not in content_type.lower():
+                raise ValueError("Data must be a valid zip file.")
+
+            # The data is written to disk and hashed in chunks as it arrives,
+            # so memory usage does not grow with the size of the data.
+            digest = hashlib.md5()
+            for chunk in chunks:
+                digest.update(chunk)
+                data_file_obj.write(chunk)
+            data_file_obj.seek(0)
+
+            if data_url:
+                site_data.save_url_cache(data_url, response.headers, digest.hexdigest())
+
+            yield (data_file_obj, digest.hexdigest())
+
+    @classmethod
+    def stage_data(cls, data_url: Optional[str], data_file: UploadFile | None) -> str:
+        """
+        Check the data source of a new case, and keep the uploaded data (if any)
+        for the create task, as the upload is only available during the request.
+
+        Returns
+        -------
+        str
+            The md5 digest of the uploaded data, or an empty string for a data URL,
+            whose digest is only known once it is fetched by the create task.
+        """
+        if data_file and data_url:
             raise ValueError(
-                "You must provide either a data file or the data_url attribute."
+                "You must provide either a data file or the data_url attribute, not both."
             )
+        if data_url:
+            return ""
 
-        if "zip" not in content_type.lower():
-            raise ValueError("Data must be a valid zip file.")
+        with cls.fetch_data(None, data_file) as (data_file_obj, digest):
+            assert data_file_obj
+            site_data.save_upload(digest, data_file_obj)
+        return digest
+
+    def ingest_data(self) -> None:
+        """
+        Fetch, store and link the data of the case. This is done by the create task,
+        as downloading and extracting the data can take a while.
+        """
+        if self.data_url:
+            with file_lock(site_data.get_url_lock_path(self.data_url)):
+                with self.fetch_data(self.data_url, None) as (data_file_obj, digest):
+                    if self.data_digest and digest != self.data_digest:
+                        # The data at the URL changed since it was last ingested,
+                        # before the case was created, so the case takes the new data.
+                        logger.info(
+                            f"The data at {self.data_url} changed, "
+                            f"replacing the data of case {self.id}"
+                        )
+                        site_data.release_data(
+                            self.data_digest, self.env["CASE_FOLDER_NAME"]
+                        )
+                    self.data_digest = digest
+                    self.extract_data(data_file_obj)
+            return
 
-        self.data_digest = hashlib.md5(data_file_obj).hexdigest()
-        self.set_id()
+        try:
+            upload: Optional[IO[bytes]] = open(
+                site_data.get_upload_path(self.data_digest), "rb"
+            )
+        except FileNotFoundError:
+            # The upload was already stored by another case with the same data.
+            upload = None
+        if upload:
+            with upload:
+                self.extract_data(upload)
+            site_data.remove_upload(self.data_digest)
+        else:
+            self.extract_data(None)
 
-        data_output_path = Path(self.env["CASE_DATA_ROOT"])
-        if data_output_path.exists():
-            shutil.rmtree(data_output_path)
-        data_output_path.mkdir(parents=True)
+    def extract_data(self, data_file_obj: Optional[IO[bytes]]) -> None:
+        """
+        Store the data, unless it is already stored,
+        and link the stored data to the data root of the case.
+        """
+        if data_file_obj:
+            site_data.store_data(self.data_digest, data_file_obj)
+        try:
+            site_data.link_data(
+                self.data_digest,
+                Path(self.env["CASE_DATA_ROOT"]),
+                self.env["CASE_FOLDER_NAME"],
+            )
+        except ValueError:
+            # The data was removed since the URL was checked,
+            # so it is downloaded again next time.
+            if self.data_url:
+                site_data.remove_url_cache(self.data_url)
+            raise ValueError("Data is no longer available, please try again.")
 
-        with ZipFile(io.BytesIO(data_file_obj), "r") as zf:
-            extract_path = Path(data_output_path)
-            zf.extractall(extract_path)
+        try:
+            self.set_user_mods()
+        except ValueError:
+            site_data.release_data(self.data_digest, self.env["CASE_FOLDER_NAME"])
+            raise
 
+    def set_user_mods(self) -> None:
+        extract_path = Path(self.env["CASE_DATA_ROOT"])
         try:
             with open(extract_path / "user_mods" / "shell_commands", "r") as f:
                 shell_commands = f.read()
@@ -376,6 +567,8 @@ class CaseBase(BaseModel):
         self.lon = float(lon.group("lon"))
         self.lat = float(lat.group("lat"))
 
+        # The file is a link to the data store, so it is replaced instead of written.
+        (extract_path / "user_mods" / "shell_commands").unlink()
         with open(extract_path / "user_mods" / "shell_commands", "w") as f:
             # Write a new shell_commands file to avoid running any malicious code
             f.write(f"./xmlchange CLM_USRDAT_DIR={extract_path}\n")
@@ -395,6 +588,198 @@ class Case(CaseBase):
     site: Optional[str] = None
 
 
+MAX_ENSEMBLE_SIZE = 1000
+
+
+class CaseEnsembleCreate(BaseModel):
+    """
+    An ensemble of cases that share the base case and its data.
+    Each member overrides variables of the base case,
+    either given one by one in `members` or as all the combinations of the values in `grid`.
+    """
+
+    base: CaseBase
+    members: List[List[CaseVariable]] = []
+    grid: Dict[str, List[VariableValue]] = {}
+
+    class Config:
+        schema_extra = {
+            "example": {
+                "base": CaseBase.Config.schema_extra["example"],
+                "grid": {"STOP_N": [1, 2, 3]},
+            }
+        }
+
+    @classmethod
+    def __get_validators__(cls) -> Generator[Any, None, None]:
+        yield cls.validate_to_json
+
+    @classmethod
+    def validate_to_json(cls, value: Any) -> Any:
+        if isinstance(value, str):
+            return cls(**json.loads(value))
+        if isinstance(value, dict):
+            return cls(**value)
+        return value
+
+    @validator("base", pre=True)
+    def validate_base(cls, value: Any) -> Any:
+        # CaseBase validators only parse JSON strings.
+        if isinstance(value, dict):
+            return CaseBase(**value)
+        return value
+
+    @root_validator
+    def validate_ensemble(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+        members = values.get("members", [])
+        grid = values.get("grid", {})
+        if bool(members) == bool(grid):
+            raise ValueError("You must provide either members or grid, not both.")
+
+        size = len(members) if members else 1
+        for grid_values in grid.values():
+            size *= len(grid_values)
+        if size > MAX_ENSEMBLE_SIZE:
+            raise ValueError(
+                f"Ensembles are limited to {MAX_ENSEMBLE_SIZE} cases, got {size}."
+            )
+
+        return values
+
+    def get_members_variables(self) -> List[List[CaseVariable]]:
+        if self.members:
+            return self.members
+        names = list(self.grid)
+        return [
+            [CaseVariable(name=name, value=value) for name, value in zip(names, values)]
+            for values in itertools.product(*(self.grid[name] for name in names))
+        ]
+
+    def get_members(self) -> List[CaseBase]:
+        """
+        Return the member cases, validated like single cases.
+        Their ids are not set yet, as they depend on the data digest.
+        """
+        base_data = self.base.dict(exclude={"id", "env", "variables"})
+        base_variables = {v.name: v for v in self.base.variables}
+        return [
+            CaseBase(
+                **base_data,
+                variables=list(
+                    {**base_variables, **{v.name: v for v in overrides}}.values()
+                ),
+            )
+            for overrides in self.get_members_variables()
+        ]
+
+
+class CaseEnsemble(BaseModel):
+    id: str
+    case_ids: List[str]
+    skipped_case_ids: List[str] = []
+    task_counts: Dict[TaskStatus, int] = {}
+
+
+class CaseFilters(BaseModel):
+    status: Optional[List[CaseCreateStatus | CaseRunStatus]]
+    site: Optional[str]
+    compset: Optional[str]
+    driver: Optional[ModelDriver]
+    created_after: Optional[datetime]
+    created_before: Optional[datetime]
+
+    @validator("created_after", "created_before")
+    def to_local_time(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # Case creation dates are stored as naive local times.
+        if value and value.tzinfo:
+            return value.astimezone().replace(tzinfo=None)
+        return value
+
+
+class CaseCursor(BaseModel):
+    """
+    Position of a case in listings, which are sorted by `date_created` and `id`.
+    It is passed to clients as an opaque string to fetch the next page.
+    """
+
+    date_created: str
+    id: str
+
+    def encode(self) -> str:
+        return base64.urlsafe_b64encode(self.json().encode("utf-8")).decode("utf-8")
+
+    @staticmethod
+    def decode(cursor: str) -> "CaseCursor":
+        try:
+            return CaseCursor.parse_raw(
+                base64.urlsafe_b64decode(cursor.encode("utf-8"))
+            )
+        except (binascii.Error, ValidationError):
+            raise ValueError(f"Invalid cursor: {cursor}")
+
+
+class CaseStatusCount(BaseModel):
+    site: Optional[str]
+    status: CaseCreateStatus | CaseRunStatus
+    count: int
+
+
+class CaseLog(BaseModel):
+    step: str
+    size: int
+    date_modified: datetime
+
+
+class CaseEvent(BaseModel):
+    """A status change of a case, with the step that made it and its duration."""
+
+    status: CaseCreateStatus | CaseRunStatus
+    step: Optional[str]
+    duration: Optional[float]
+    date_created: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class CaseStep(BaseModel):
+    name: str
+    pipeline: str
+    depends_on: List[str]
+    retries: int
+    status: TaskStatus
+    attempts: int
+    error: Optional[str]
+    date_updated: Optional[datetime]
+
+
+class CasePartial(BaseModel):
+    """
+    The fields of a case that are selected with the `fields` query parameter.
+    Fields that are not selected are left unset and excluded from the response.
+    """
+
+    id: str
+    name: Optional[str]
+    model_version: Optional[str]
+    status: Optional[CaseCreateStatus | CaseRunStatus]
+    date_created: Optional[datetime]
+    create_task_id: Optional[str]
+    run_task_id: Optional[str]
+    compset: Optional[str]
+    lat: Optional[float]
+    lon: Optional[float]
+    variables: Optional[List[CaseVariable]]
+    fates_indices: Optional[str]
+    env: Optional[Dict[str, str]]
+    driver: Optional[ModelDriver]
+    data_url: Optional[str]
+    data_digest: Optional[str]
+    site: Optional[str]
+    create_task: Optional[Task]
+    run_task: Optional[Task]
+
+
 class CaseWithTaskInfo(Case):
     create_task: Task
     run_task: Task
@@ -403,22 +788,91 @@ class CaseWithTaskInfo(Case):
     def get_case_with_task_info(
         case: "CaseModel", site: Optional[str] = None
     ) -> Optional["CaseWithTaskInfo"]:
-        tasks = {}
-        for task_id_type in ["create_task_id", "run_task_id"]:
-            task_id = getattr(case, task_id_type)
-            task_dict = {"task_id": None, "status": None, "result": None, "error": None}
-            if task_id:
-                task = celery_app.AsyncResult(task_id)
-                task_dict = {
-                    "task_id": task.id,
-                    "status": task.status,
-                    "result": task.result,
-                    "error": task.traceback.strip().split("\n")[-1]
-                    if task.traceback
-                    else None,
-                }
-            tasks[task_id_type[:-3]] = task_dict
-
-        case_dict = CaseBase.from_orm(case).dict()
-        case_dict["site"] = site
-        return CaseWithTaskInfo(**case_dict, **tasks)
+        return CaseWithTaskInfo.get_cases_with_task_info([(case, site)])[0]
+
+    @staticmethod
+    def get_cases_tasks_meta(
+        cases_and_sites: Sequence[Tuple["CaseModel", Optional[str]]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch the tasks of all the given cases from the result backend at once.
+        """
+        return get_tasks_meta(
+            task_id
+            for (case, _) in cases_and_sites
+            for task_id in [case.create_task_id, case.run_task_id]
+            if task_id
+        )
+
+    @staticmethod
+    def get_task_info(
+        task_id: Optional[str], tasks_meta: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        if not task_id:
+            return {"task_id": None, "status": None, "result": None, "error": None}
+
+        task_meta = tasks_meta[task_id]
+        return {
+            "task_id": task_id,
+            "status": task_meta["status"],
+            "result": task_meta["result"],
+            "error": task_meta["traceback"].strip().split("\n")[-1]
+            if task_meta["traceback"]
+            else None,
+        }
+
+    @staticmethod
+    def get_cases_with_task_info(
+        cases_and_sites: Sequence[Tuple["CaseModel", Optional[str]]]
+    ) -> List["CaseWithTaskInfo"]:
+        """
+        Attach the task info to the given cases.
+        """
+        tasks_meta = CaseWithTaskInfo.get_cases_tasks_meta(cases_and_sites)
+
+        cases_with_task_info = []
+        for (case, site) in cases_and_sites:
+            tasks = {
+                task_id_type[:-3]: CaseWithTaskInfo.get_task_info(
+                    getattr(case, task_id_type), tasks_meta
+                )
+                for task_id_type in ["create_task_id", "run_task_id"]
+            }
+
+            case_dict = CaseBase.from_orm(case).dict()
+            case_dict["site"] = site
+            cases_with_task_info.append(CaseWithTaskInfo(**case_dict, **tasks))
+
+        return cases_with_task_info
+
+    @staticmethod
+    def get_cases_summary(
+        cases_and_sites: Sequence[Tuple["CaseModel", Optional[str]]],
+        fields: Set[str],
+    ) -> List[CasePartial]:
+        """
+        Return only the given fields of the cases.
+        Task info is only fetched if it is requested,
+        and case columns that are not requested are not read from the model instances.
+        """
+        tasks_meta = (
+            CaseWithTaskInfo.get_cases_tasks_meta(cases_and_sites)
+            if fields & {"create_task", "run_task"}
+            else {}
+        )
+
+        cases_summary = []
+        for (case, site) in cases_and_sites:
+            case_summary: Dict[str, Any] = {"id": case.id}
+            for field in fields:
+                if field == "site":
+                    case_summary[field] = site
+                elif field in ("create_task", "run_task"):
+                    case_summary[field] = CaseWithTaskInfo.get_task_info(
+                        getattr(case, f"{field}_id"), tasks_meta
+                    )
+                else:
+                    case_summary[field] = getattr(case, field)
+            cases_summary.append(CasePartial(**case_summary))
+
+        return cases_summary
@@ -32,6 +32,7 @@ class ModelDriver(str, Enum):
 
 
 class CaseCreateStatus(str, Enum):
+    INGESTING = "INGESTING"
     INITIALISED = "INITIALISED"
     CREATED = "CREATED"
     SETUP = "SETUP"
@@ -0,0 +1,42 @@
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class HistoryFormat(str, Enum):
+    json = "json"
+    csv = "csv"
+    arrow = "arrow"
+
+
+class HistoryFile(BaseModel):
+    name: str
+    size: int
+    date_modified: datetime
+
+
+class HistoryVariable(BaseModel):
+    name: str
+    long_name: Optional[str]
+    units: Optional[str]
+    dims: List[str]
+
+
+class HistoryTape(BaseModel):
+    """The history files written by a component to the same history tape, e.g. clm2.h0."""
+
+    tape: str
+    files: List[HistoryFile]
+    variables: List[HistoryVariable]
+
+
+class HistorySummary(BaseModel):
+    """Aggregates of a history tape computed after the runs of a case."""
+
+    tape: str
+    frequencies: List[str]
+    variables: List[str]
+    files: int
+    date_updated: datetime
@@ -1,6 +1,6 @@
-from typing import Any, Optional, TypeVar
+from typing import Any, List, Optional, TypeVar
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from .constants import TaskStatus
 
@@ -12,3 +12,7 @@ class Task(BaseModel):
     status: Optional[TaskStatus]
     result: Optional[Any]
     error: Optional[str]
+
+
+class TasksStatusRequest(BaseModel):
+    task_ids: List[str] = Field(..., min_items=1, max_items=1000)
@@ -1,2 +1,3 @@
-from .cases import create_case, run_case
+from .cases import create_case, get_case_steps, prefetch_input_data, run_case
+from .events import case_events, send_case_status_event
 from .sites import create_data
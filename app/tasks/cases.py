@@ -3,18 +3,33 @@ import json
 import os
 import shutil
 import subprocess
-import tempfile
 import time
+from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Union, cast
+from typing import Dict, List, Optional, Tuple, Union, cast
+
+from celery import Task
 
 from app import crud, models, schemas
 from app.core import settings
 from app.db.session import SessionLocal
+from app.utils import (
+    build_cache,
+    case_logs,
+    case_templates,
+    cores,
+    fates,
+    input_data,
+    metrics,
+    summaries,
+)
+from app.utils.locks import file_lock
 from app.utils.logger import logger
 from app.utils.type_casting import to_bool
 
-from .celery_app import celery_app
+from .celery_app import CONFIGURE_QUEUE, DATA_QUEUE, RUN_QUEUE, celery_app
+from .events import send_case_status_event
+from .pipeline import Pipeline, Step
 
 
 def to_namelist_value(
@@ -41,6 +56,52 @@ def to_namelist_value(
     return ",".join(namelist_value_list)
 
 
+def get_case(case_id: str) -> models.CaseModel:
+    """
+    Load the case of a task. Tasks are sent the case id only,
+    so they work on the current state of the case instead of a copy made when queued.
+    """
+    with SessionLocal() as db:
+        case = crud.case.get(db, id=case_id)
+    if not case:
+        raise ValueError(f"Case {case_id} not found")
+    return case
+
+
+def run_logged_cmd(
+    cmd: List[str], cwd: Optional[Path], env: Dict[str, str], log_path: Path
+) -> None:
+    """
+    Run a command with its output appended to a log file as it is produced,
+    instead of being kept in memory.
+    """
+    step = case_logs.get_step_name(cmd)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(log_path, "ab") as log_file:
+        log_file.write(f"### {datetime.now()} {' '.join(cmd)}\n".encode("utf-8"))
+        log_file.flush()
+        log_start = log_file.tell()
+        proc = subprocess.run(
+            cmd,
+            cwd=cwd,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            env={**os.environ, **env},
+        )
+        log_end = log_file.seek(0, 2)
+
+    if proc.returncode != 0:
+        tail_start = max(log_start, log_end - case_logs.ERROR_TAIL_SIZE)
+        (log_tail, _, _) = case_logs.read_log(
+            log_path, tail_start, log_end - tail_start
+        )
+        raise Exception(
+            f"{step} failed with exit code {proc.returncode}. "
+            f"See {log_path.name} from offset {log_start} to {log_end}.\n"
+            + log_tail.decode("utf-8", errors="replace").strip()
+        )
+
+
 def run_cmd(
     case: models.CaseModel,
     cmd: List[str],
@@ -50,37 +111,148 @@ def run_cmd(
     logger.info(f"Running {' '.join(cmd)}")
     start = time.time()
 
+    step = case_logs.get_step_name(cmd)
+    try:
+        run_logged_cmd(
+            cmd,
+            cwd,
+            case.env,
+            case_logs.get_log_path(case.env["CASE_FOLDER_NAME"], step),
+        )
+    except Exception:
+        metrics.observe_stage(step, case, time.time() - start, False)
+        raise
+
+    duration = time.time() - start
+    logger.info(f"Finished {cmd[0]} in {duration} seconds")
+    metrics.observe_stage(step, case, duration, True)
+    update_status(case, success_status, step, duration)
+
+
+def update_status(
+    case: models.CaseModel,
+    status: schemas.CaseCreateStatus | schemas.CaseRunStatus,
+    step: Optional[str] = None,
+    duration: Optional[float] = None,
+) -> None:
+    with SessionLocal() as db:
+        crud.case.set_status(
+            db, id=case.id, status=status, step=step, duration=duration
+        )
+    case.status = status
+    send_case_status_event(case.id, status)
+
+
+def xmlquery(case: models.CaseModel, case_path: Path, variable_name: str) -> str:
     proc = subprocess.run(
-        cmd, cwd=cwd, capture_output=True, env={**os.environ, **case.env}
+        ["./xmlquery", "--value", variable_name],
+        cwd=case_path,
+        capture_output=True,
+        env={**os.environ, **case.env},
     )
 
-    logger.info(f"Finished {cmd[0]} in {time.time() - start} seconds")
+    if proc.returncode != 0:
+        raise Exception(proc.stderr.decode("utf-8").strip())
+
+    return proc.stdout.decode("utf-8").strip()
+
+
+def xmlchange(case: models.CaseModel, case_path: Path, changes: Dict[str, str]) -> None:
+    proc = subprocess.run(
+        ["./xmlchange", ",".join(f"{k}={v}" for k, v in changes.items())],
+        cwd=case_path,
+        capture_output=True,
+        env={**os.environ, **case.env},
+    )
 
     if proc.returncode != 0:
         raise Exception(proc.stderr.decode("utf-8").strip())
 
-    with SessionLocal() as db:
-        crud.case.update(
-            db,
-            db_obj=case,
-            obj_in={"status": success_status},
+
+def compile_case(
+    case: models.CaseModel,
+    case_path: Path,
+    success_status: schemas.CaseRunStatus,
+) -> None:
+    """
+    Run ./case.build with as many make jobs as the cores it could reserve,
+    so concurrent builds share the cores of the worker.
+    """
+    with cores.reserve_cores(
+        f"build-{case.id}", settings.BUILD_MAX_CORES
+    ) as build_cores:
+        xmlchange(case, case_path, {"GMAKE_J": str(build_cores)})
+        run_cmd(case, ["./case.build"], case_path, success_status)
+
+
+# Variables set by ./case.build that must be restored along with a cached build.
+BUILD_XML_VARS = ["SMP_BUILD", "NINST_BUILD"]
+
+
+def build_case(case: models.CaseModel, case_path: Path) -> None:
+    """
+    Build the case, or restore the build from the build cache if a case
+    with the same build configuration has already been built.
+    """
+    if not settings.ENABLE_BUILD_CACHE:
+        compile_case(case, case_path, schemas.CaseRunStatus.BUILT)
+        return
+
+    build_key = build_cache.get_build_key(case, case_path)
+    exeroot = Path(xmlquery(case, case_path, "EXEROOT"))
+    sharedlibroot = Path(xmlquery(case, case_path, "SHAREDLIBROOT"))
+
+    cached_xml_vars = build_cache.restore_build(build_key, exeroot, sharedlibroot)
+    if cached_xml_vars is not None:
+        xml_change_flags = [f"{k}={v}" for k, v in cached_xml_vars.items() if v]
+        run_cmd(
+            case,
+            ["./xmlchange", ",".join(["BUILD_COMPLETE=TRUE", *xml_change_flags])],
+            case_path,
+            schemas.CaseRunStatus.BUILT,
+        )
+        # ./case.build locks env_build.xml after a successful build.
+        # Without the lock, CIME considers the build invalid.
+        shutil.copy(
+            case_path / "env_build.xml", case_path / "LockedFiles" / "env_build.xml"
         )
+        return
+
+    compile_case(case, case_path, schemas.CaseRunStatus.BUILT)
+
+    build_cache.store_build(
+        build_key,
+        exeroot,
+        sharedlibroot,
+        {
+            variable_name: xmlquery(case, case_path, variable_name)
+            for variable_name in BUILD_XML_VARS
+        },
+    )
 
 
-@celery_app.task
-def create_case(case: models.CaseModel) -> str:
-    case_path = settings.CASES_ROOT / case.env["CASE_FOLDER_NAME"]
-    case_data_root = Path(case.env["CASE_DATA_ROOT"])
+def get_case_path(case: models.CaseModel) -> Path:
+    return settings.CASES_ROOT / case.env["CASE_FOLDER_NAME"]
 
-    logger.info(
-        f"Creating case {case.id} with the following attributes:\n"
-        f"Path: {case_path}\n"
-        f"Compset: {case.compset}\n"
-        f"Variables: {json.dumps(case.variables, indent=2)}\n"
-        f"Driver: {case.driver}\n"
-    )
 
-    shutil.rmtree(case_path, ignore_errors=True)
+# Lines added to user_nl_clm by the API come after this marker,
+# so they can be written again without duplicating them.
+USER_NL_CLM_MARKER = "! Case variables"
+
+
+def write_user_nl_clm(case_path: Path, lines: List[str]) -> None:
+    user_nl_clm_path = case_path / "user_nl_clm"
+    content = user_nl_clm_path.read_text() if user_nl_clm_path.exists() else ""
+    (content, _, _) = content.partition(f"{USER_NL_CLM_MARKER}\n")
+    with open(user_nl_clm_path, "w") as f:
+        f.write(content)
+        if lines:
+            f.write(f"{USER_NL_CLM_MARKER}\n")
+            f.writelines(f"{line}\n" for line in lines)
+
+
+def get_create_new_case_cmd(case: models.CaseModel, case_path: Path) -> List[str]:
+    case_data_root = Path(case.env["CASE_DATA_ROOT"])
 
     create_new_case_cmd = [
         str(settings.MODEL_ROOT / "cime" / "scripts" / "create_newcase"),
@@ -91,7 +263,7 @@ def create_case(case: models.CaseModel) -> str:
         "--driver",
         case.driver,
         "--res",
-        "CLM_USRDAT",
+        case_templates.RESOLUTION,
         "--machine",
         settings.MACHINE_NAME,
         "--run-unsupported",
@@ -107,80 +279,211 @@ def create_case(case: models.CaseModel) -> str:
             ]
         )
 
+    return create_new_case_cmd
+
+
+def ingest_data(case: models.CaseModel) -> None:
+    """
+    Fetch and extract the data of the case, which sets its digest and location.
+    """
+    case_data = schemas.CaseBase.from_orm(case)
+    with metrics.time_stage("ingest", case):
+        case_data.ingest_data()
+    with SessionLocal() as db:
+        crud.case.update(
+            db,
+            db_obj=case,
+            obj_in={
+                "data_digest": case_data.data_digest,
+                "lat": case_data.lat,
+                "lon": case_data.lon,
+            },
+        )
+    update_status(case, schemas.CaseCreateStatus.INITIALISED, "ingest")
+
+
+def create_new_case(case: models.CaseModel) -> None:
+    case_path = get_case_path(case)
+
+    logger.info(
+        f"Creating case {case.id} with the following attributes:\n"
+        f"Path: {case_path}\n"
+        f"Compset: {case.compset}\n"
+        f"Variables: {json.dumps(case.variables, indent=2)}\n"
+        f"Driver: {case.driver}\n"
+    )
+
+    shutil.rmtree(case_path, ignore_errors=True)
+
+    if not settings.ENABLE_CASE_TEMPLATES:
+        run_cmd(
+            case,
+            get_create_new_case_cmd(case, case_path),
+            None,
+            schemas.CaseCreateStatus.CREATED,
+        )
+        return
+
+    template_key = case_templates.get_template_key(case)
+    template_case_path = case_templates.get_template_case_path(template_key)
+    with file_lock(case_templates.get_lock_path(template_key)):
+        if not case_templates.is_template_ready(template_key):
+            logger.info(f"Creating case template {template_key}")
+            case_templates.remove_stale_templates()
+            case_templates.remove_template(template_key)
+            # The template is shared by many cases, so its commands are logged
+            # with the template instead of the case they are run for.
+            # The status of the case is only updated once it is cloned.
+            template_log_path = case_templates.get_log_path(template_key)
+            run_logged_cmd(
+                get_create_new_case_cmd(case, template_case_path),
+                None,
+                case.env,
+                template_log_path,
+            )
+            run_logged_cmd(
+                ["./case.setup"], template_case_path, case.env, template_log_path
+            )
+            case_templates.save_template(template_key, case)
+
     run_cmd(
         case,
-        create_new_case_cmd,
+        [
+            str(settings.MODEL_ROOT / "cime" / "scripts" / "create_clone"),
+            "--case",
+            str(case_path),
+            "--clone",
+            str(template_case_path),
+        ],
         None,
         schemas.CaseCreateStatus.CREATED,
     )
+    # The rest of the user_mods are the same for all the clones of the template.
+    xmlchange(
+        case,
+        case_path,
+        {
+            "CLM_USRDAT_DIR": case.env["CASE_DATA_ROOT"],
+            "PTS_LON": str(case.lon),
+            "PTS_LAT": str(case.lat),
+        },
+    )
+
+
+def setup_case(case: models.CaseModel) -> None:
+    case_path = get_case_path(case)
+    if settings.ENABLE_CASE_TEMPLATES and (case_path / ".case.run").exists():
+        # The case is cloned from a template that is already set up.
+        update_status(case, schemas.CaseCreateStatus.SETUP)
+        return
+
     run_cmd(case, ["./case.setup"], case_path, schemas.CaseCreateStatus.SETUP)
 
-    if case.variables:
-        xml_change_flags: List[str] = []
 
-        for variable_dict in case.variables:
-            assert isinstance(variable_dict, dict)
-            variable = schemas.CaseVariable(**variable_dict)
+def update_case_variables(case: models.CaseModel) -> None:
+    case_path = get_case_path(case)
+    case_data_root = Path(case.env["CASE_DATA_ROOT"])
 
-            if variable.name == "user_nl_clm_extra":
-                with open(case_path / "user_nl_clm", "a") as f:
-                    f.write(str(variable.value) + "\n")
-                continue
+    xml_change_flags: List[str] = []
+    user_nl_clm_lines: List[str] = []
 
-            variable_config = schemas.CaseVariableConfig.get_variable_config(
-                variable.name
-            )
+    for variable_dict in case.variables:
+        assert isinstance(variable_dict, dict)
+        variable = schemas.CaseVariable(**variable_dict)
 
-            if not variable_config:
-                # This should only happen if an old case is being run with updated config
-                raise Exception(f"Variable {variable.name} is not supported")
+        if variable.name == "user_nl_clm_extra":
+            user_nl_clm_lines.append(str(variable.value))
+            continue
 
-            value = (
-                ",".join(map(lambda v: str(v), variable.value))
-                if isinstance(variable.value, list)
-                else variable.value
-            )
+        variable_config = schemas.CaseVariableConfig.get_variable_config(variable.name)
+
+        if not variable_config:
+            # This should only happen if an old case is being run with updated config
+            raise Exception(f"Variable {variable.name} is not supported")
+
+        value = (
+            ",".join(map(lambda v: str(v), variable.value))
+            if isinstance(variable.value, list)
+            else variable.value
+        )
 
-            if variable_config.append_input_path:
-                assert isinstance(value, str)
-                value = str(case_data_root / Path(value))
-
-            if variable_config.category == "xml_var":
-                xml_change_flags.append(f"{variable.name}={value}")
-            elif (
-                variable_config.category == "user_nl_clm"
-                or variable_config.category == "user_nl_clm_history_file"
-            ):
-                with open(case_path / "user_nl_clm", "a") as f:
-                    f.write(
-                        f"{variable.name} = {to_namelist_value(variable_config, value)}\n"
-                    )
-
-        if xml_change_flags:
-            run_cmd(
-                case,
-                ["./xmlchange", ",".join(xml_change_flags)],
-                case_path,
-                schemas.CaseCreateStatus.UPDATED,
+        if variable_config.append_input_path:
+            assert isinstance(value, str)
+            value = str(case_data_root / Path(value))
+
+        if variable_config.category == "xml_var":
+            xml_change_flags.append(f"{variable.name}={value}")
+        elif (
+            variable_config.category == "user_nl_clm"
+            or variable_config.category == "user_nl_clm_history_file"
+        ):
+            user_nl_clm_lines.append(
+                f"{variable.name} = {to_namelist_value(variable_config, value)}"
             )
 
-    with SessionLocal() as db:
-        crud.case.update(
-            db,
-            db_obj=case,
-            obj_in={"status": schemas.CaseCreateStatus.CONFIGURED},
+    write_user_nl_clm(case_path, user_nl_clm_lines)
+
+    if xml_change_flags:
+        run_cmd(
+            case,
+            ["./xmlchange", ",".join(xml_change_flags)],
+            case_path,
+            schemas.CaseCreateStatus.UPDATED,
         )
 
+
+def preview_namelists(case: models.CaseModel) -> None:
+    # Also lists the input data of the case in Buildconf, so it can be prefetched.
+    run_cmd(
+        case,
+        ["./preview_namelists"],
+        get_case_path(case),
+        schemas.CaseCreateStatus.CONFIGURED,
+    )
+
+
+create_case_pipeline = Pipeline(
+    "create",
+    [
+        Step("ingest", ingest_data, retries=3, retry_delay=30, queue=DATA_QUEUE),
+        Step(
+            "create",
+            create_new_case,
+            depends_on=["ingest"],
+            queue=CONFIGURE_QUEUE,
+        ),
+        Step("setup", setup_case, depends_on=["create"]),
+        Step("xmlchange", update_case_variables, depends_on=["setup"]),
+        Step("namelists", preview_namelists, depends_on=["xmlchange"]),
+    ],
+)
+
+
+@celery_app.task(bind=True)
+def create_case(self: Task, case_id: str) -> str:
+    if not create_case_pipeline.run(self, get_case(case_id)):
+        return "Case is queued to be created"
     return "Case is configured"
 
 
 @celery_app.task
-def run_case(case: models.CaseModel) -> str:
-    case_path = settings.CASES_ROOT / case.env["CASE_FOLDER_NAME"]
-    case_data_root = Path(case.env["CASE_DATA_ROOT"])
+def prefetch_input_data(case_id: str) -> str:
+    """
+    Fetch the input data of a case while it waits to be built.
+    """
+    missing_files = input_data.fetch_case_input_data(get_case_path(get_case(case_id)))
+    return f"{len(missing_files)} input data files could not be fetched"
+
 
-    run_cmd(case, ["./case.build"], case_path, schemas.CaseRunStatus.BUILT)
+def build(case: models.CaseModel) -> None:
+    build_case(case, get_case_path(case))
 
+
+def check_input_data(case: models.CaseModel) -> None:
+    case_path = get_case_path(case)
+    # Files that are being fetched for other cases are waited for instead of downloaded again.
+    # Files that could not be fetched are left to ./check_input_data.
+    input_data.fetch_case_input_data(case_path)
     run_cmd(
         case,
         ["./check_input_data", "--download"],
@@ -188,125 +491,187 @@ def run_case(case: models.CaseModel) -> str:
         schemas.CaseRunStatus.INPUT_DATA_READY,
     )
 
+
+def get_fates_indices(case: models.CaseModel) -> Optional[List[int]]:
     fates_indices_dict = next(
         (v for v in case.variables if v["name"] == "included_pft_indices"), None
     )
-    if fates_indices_dict:
-        assert isinstance(fates_indices_dict, dict)
-        fates_indices = cast(
-            List[str], schemas.CaseVariable(**fates_indices_dict).value
-        )
+    if not fates_indices_dict:
+        return None
+    assert isinstance(fates_indices_dict, dict)
+    fates_indices = cast(List[int], schemas.CaseVariable(**fates_indices_dict).value)
+    return [int(index) for index in fates_indices]
+
+
+def get_fates_param_path(case: models.CaseModel) -> Tuple[Path, Optional[Path]]:
+    """
+    Return the FATES parameter file of the case and, if the case does not set one,
+    the default parameter file that must be copied to it.
+    """
+    case_data_root = Path(case.env["CASE_DATA_ROOT"])
 
-        # Find the fates parameter file
-        fates_param_path_dict = next(
-            filter(lambda v: v["name"] == "fates_paramfile", case.variables), None
+    # Find the fates parameter file
+    fates_param_path_dict = next(
+        filter(lambda v: v["name"] == "fates_paramfile", case.variables), None
+    )
+
+    if fates_param_path_dict:
+        assert isinstance(fates_param_path_dict, dict)
+        fates_param_path = schemas.CaseVariable(**fates_param_path_dict).value
+        assert isinstance(fates_param_path, str)
+
+        fates_paramfile_variable_config = (
+            schemas.CaseVariableConfig.get_variable_config("fates_paramfile")
+        )
+        if not fates_paramfile_variable_config:
+            # This should only happen if an old case is being run with updated config
+            raise Exception("Variable fates_paramfile is not supported")
+
+        if fates_paramfile_variable_config.append_input_path:
+            fates_param_path = str(case_data_root / Path(fates_param_path))
+        return (Path(fates_param_path), None)
+
+    if fates_param_files := glob.glob(
+        "**/fates_params_api*", root_dir=settings.CESMDATAROOT, recursive=True
+    ):
+        if len(fates_param_files) > 1:
+            logger.warning("Multiple fates parameter files found, using the first one")
+        default_fates_param_path = settings.CESMDATAROOT / fates_param_files[0]
+        return (
+            case_data_root / default_fates_param_path.name,
+            default_fates_param_path,
         )
 
-        if fates_param_path_dict:
-            assert isinstance(fates_param_path_dict, dict)
-            fates_param_path = schemas.CaseVariable(**fates_param_path_dict).value
-            assert isinstance(fates_param_path, str)
+    raise Exception("Could not find FATES param file")
 
-            fates_paramfile_variable_config = (
-                schemas.CaseVariableConfig.get_variable_config("fates_paramfile")
-            )
-            if not fates_paramfile_variable_config:
-                # This should only happen if an old case is being run with updated config
-                raise Exception("Variable fates_paramfile is not supported")
-
-            if fates_paramfile_variable_config.append_input_path:
-                fates_param_path = str(case_data_root / Path(fates_param_path))
-        elif fates_param_files := glob.glob(
-            "**/fates_params_api*", root_dir=settings.CESMDATAROOT, recursive=True
-        ):
-            if len(fates_param_files) > 1:
-                logger.warning(
-                    "Multiple fates parameter files found, using the first one"
-                )
-            # Copy the fates parameter file to the case data root
-            shutil.copy(settings.CESMDATAROOT / fates_param_files[0], case_data_root)
-            fates_param_file_name = Path(fates_param_files[0]).name
-            fates_param_path = str(case_data_root / fates_param_file_name)
-            with open(case_path / "user_nl_clm", "a") as f:
-                f.write(
-                    f"fates_paramfile = '$CLM_USRDAT_DIR/{fates_param_file_name}'\n"
-                )
-            # We have to rebuild the case because clm namelist is changed
-            run_cmd(case, ["./case.build"], case_path, schemas.CaseRunStatus.REBUILT)
-        else:
-            raise Exception("Could not find FATES param file")
-
-        for variable_dict in case.variables:
-            assert isinstance(variable_dict, dict)
-            variable = schemas.CaseVariable(**variable_dict)
-
-            if variable.name == "user_nl_clm_extra":
-                continue
-
-            variable_config = schemas.CaseVariableConfig.get_variable_config(
-                variable.name
+
+def get_fates_params(case: models.CaseModel) -> Dict[str, List[fates.ParamValue]]:
+    fates_params: Dict[str, List[fates.ParamValue]] = {}
+    for variable_dict in case.variables:
+        assert isinstance(variable_dict, dict)
+        variable = schemas.CaseVariable(**variable_dict)
+
+        if variable.name == "user_nl_clm_extra":
+            continue
+
+        variable_config = schemas.CaseVariableConfig.get_variable_config(variable.name)
+
+        if not variable_config:
+            # This should only happen if an old case is being run with updated config
+            raise Exception(f"Variable {variable.name} is not supported")
+
+        if variable_config.category == "fates_param":
+            fates_params[variable.name] = (
+                variable.value if isinstance(variable.value, list) else [variable.value]
             )
+    return fates_params
 
-            if not variable_config:
-                # This should only happen if an old case is being run with updated config
-                raise Exception(f"Variable {variable.name} is not supported")
-
-            if variable_config.category == "fates_param":
-                param_values = cast(List[int], variable.value)
-                for idx, value in enumerate(param_values):
-                    run_cmd(
-                        case,
-                        [
-                            str(
-                                settings.MODEL_ROOT
-                                / "components"
-                                / "clm"
-                                / "src"
-                                / "fates"
-                                / "tools"
-                                / "modify_fates_paramfile.py"
-                            ),
-                            "--fin",
-                            fates_param_path,
-                            "--fout",
-                            fates_param_path,
-                            "--O",
-                            "--pft",
-                            str(idx + 1),
-                            "--var",
-                            variable.name,
-                            "--value",
-                            str(value),
-                        ],
-                        None,
-                        schemas.CaseRunStatus.FATES_PARAMS_UPDATED,
-                    )
-
-        (_, output) = tempfile.mkstemp()
-        run_cmd(
-            case,
-            [
-                str(
-                    settings.MODEL_ROOT
-                    / "components"
-                    / "clm"
-                    / "src"
-                    / "fates"
-                    / "tools"
-                    / "FatesPFTIndexSwapper.py"
-                ),
-                "--pft-indices",
-                ",".join(fates_indices),
-                "--fin",
-                fates_param_path,
-                "--fout",
-                output,
-            ],
-            None,
-            schemas.CaseRunStatus.FATES_INDICES_SET,
+
+def update_fates_paramfile(
+    case: models.CaseModel,
+    fates_param_path: Path,
+    fates_indices: Optional[List[int]] = None,
+) -> None:
+    """
+    Apply the FATES edits of the case to a fresh copy of the original parameter file,
+    so the FATES step can be repeated.
+    """
+    original_fates_param_path = fates_param_path.with_name(
+        f"{fates_param_path.name}.orig"
+    )
+    if not original_fates_param_path.exists():
+        shutil.copy(fates_param_path, original_fates_param_path)
+    # The file can be a link to the site data store, so it is replaced instead of written.
+    fates_param_path.unlink(missing_ok=True)
+    shutil.copy(original_fates_param_path, fates_param_path)
+
+    logger.info(f"Updating FATES parameter file {fates_param_path}")
+    start = time.time()
+    with metrics.time_stage("fates_params", case):
+        fates.update_fates_paramfile(
+            fates_param_path,
+            get_fates_params(case),
+            fates_indices,
         )
-        shutil.move(output, fates_param_path)
+    logger.info(f"Finished updating FATES parameters in {time.time() - start} seconds")
+
 
-    run_cmd(case, ["./case.submit"], case_path, schemas.CaseRunStatus.SUBMITTED)
+def set_fates(case: models.CaseModel) -> None:
+    fates_indices = get_fates_indices(case)
+    if fates_indices is None:
+        return
 
+    case_path = get_case_path(case)
+    (fates_param_path, default_fates_param_path) = get_fates_param_path(case)
+
+    if default_fates_param_path:
+        # Copy the fates parameter file to the case data root
+        fates_param_path.unlink(missing_ok=True)
+        shutil.copy(default_fates_param_path, fates_param_path)
+        fates_paramfile_line = (
+            f"fates_paramfile = '$CLM_USRDAT_DIR/{fates_param_path.name}'"
+        )
+        user_nl_clm_path = case_path / "user_nl_clm"
+        if fates_paramfile_line not in user_nl_clm_path.read_text().splitlines():
+            with open(user_nl_clm_path, "a") as f:
+                f.write(f"{fates_paramfile_line}\n")
+        # We have to rebuild the case because clm namelist is changed
+        compile_case(case, case_path, schemas.CaseRunStatus.REBUILT)
+
+    # The parameters and the PFT indices are applied in a single pass over the file.
+    update_fates_paramfile(case, fates_param_path, fates_indices)
+    if get_fates_params(case):
+        update_status(case, schemas.CaseRunStatus.FATES_PARAMS_UPDATED, "fates")
+    update_status(case, schemas.CaseRunStatus.FATES_INDICES_SET, "fates")
+
+
+def submit_case(case: models.CaseModel) -> None:
+    case_path = get_case_path(case)
+    # Without a batch system, the model runs in the worker with the task count set up for the case.
+    # Its cores are reserved so that builds started meanwhile use fewer cores.
+    total_tasks = int(xmlquery(case, case_path, "TOTALTASKS"))
+    if not to_bool(xmlquery(case, case_path, "CONTINUE_RUN")):
+        # The history files are written again from the start of the run.
+        summaries.remove_summaries(case.env["CASE_FOLDER_NAME"])
+    with cores.reserve_cores(f"run-{case.id}", total_tasks, min_cores=total_tasks):
+        run_cmd(case, ["./case.submit"], case_path, schemas.CaseRunStatus.SUBMITTED)
+
+
+def summarize_case(case: models.CaseModel) -> None:
+    with metrics.time_stage("summaries", case):
+        summaries.update_summaries(get_case_path(case), case.env["CASE_FOLDER_NAME"])
+
+
+run_case_pipeline = Pipeline(
+    "run",
+    [
+        Step("build", build),
+        Step(
+            "input_data",
+            check_input_data,
+            depends_on=["build"],
+            retries=3,
+            retry_delay=60,
+        ),
+        Step("fates", set_fates, depends_on=["input_data"]),
+        Step("submit", submit_case, depends_on=["fates"], queue=RUN_QUEUE),
+        Step(
+            "summaries",
+            summarize_case,
+            depends_on=["submit"],
+            retries=1,
+            queue=DATA_QUEUE,
+        ),
+    ],
+)
+
+
+@celery_app.task(bind=True)
+def run_case(self: Task, case_id: str) -> str:
+    if not run_case_pipeline.run(self, get_case(case_id)):
+        return "Case is queued to run"
     return "Case is ready"
+
+
+def get_case_steps(case: models.CaseModel) -> List[schemas.CaseStep]:
+    return create_case_pipeline.get_steps(case) + run_case_pipeline.get_steps(case)
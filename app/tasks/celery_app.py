@@ -1,4 +1,5 @@
 from celery import Celery
+from kombu import Queue
 
 from app.core import settings
 
@@ -6,18 +7,51 @@ celery_app = Celery(
     "tasks", broker=settings.CELERY_BROKER_URL, backend=settings.CELERY_RESULT_BACKEND
 )
 
+# Light and heavy tasks are consumed by separate workers,
+# so short tasks do not wait behind builds and runs.
+CONFIGURE_QUEUE = "configure"
+BUILD_QUEUE = "build"
+RUN_QUEUE = "run"
+DATA_QUEUE = "data"
+
 
 class CeleryConfig:
     """
-    Change the default serializer to allow passing of db models
-    and pydantic schemas to celery tasks.
+    Tasks are sent ids (e.g. the case id) and load what they need from the database,
+    so messages and results are small and serialized as JSON.
     """
 
-    task_serializer = "pickle"
-    result_serializer = "pickle"
+    task_serializer = "json"
+    result_serializer = "json"
     event_serializer = "json"
-    accept_content = ["application/json", "application/x-python-serialize"]
-    result_accept_content = ["application/json", "application/x-python-serialize"]
+    accept_content = ["application/json"]
+    result_accept_content = ["application/json"]
+
+    task_default_queue = CONFIGURE_QUEUE
+    task_queues = [
+        Queue(queue) for queue in [CONFIGURE_QUEUE, BUILD_QUEUE, RUN_QUEUE, DATA_QUEUE]
+    ]
+    task_routes = {
+        # Creating a case starts by ingesting its data.
+        "app.tasks.cases.create_case": {"queue": DATA_QUEUE},
+        "app.tasks.cases.run_case": {"queue": BUILD_QUEUE},
+        "app.tasks.cases.prefetch_input_data": {"queue": DATA_QUEUE},
+        "app.tasks.sites.create_data": {"queue": DATA_QUEUE},
+    }
+
+    # Tasks are acknowledged once they finish, so they are delivered again if a worker dies,
+    # and each worker process only reserves the task it runs instead of prefetching more.
+    task_acks_late = True
+    task_reject_on_worker_lost = True
+    worker_prefetch_multiplier = 1
+
+    # The result backend can share the SQLite database of the API, whose engine sets it
+    # to WAL mode, so its connections wait for the database lock as long as the API's.
+    database_engine_options = (
+        {"connect_args": {"timeout": settings.SQLITE_BUSY_TIMEOUT}}
+        if settings.CELERY_RESULT_BACKEND.startswith("db+sqlite")
+        else {}
+    )
 
 
 celery_app.config_from_object(CeleryConfig)
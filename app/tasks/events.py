@@ -0,0 +1,159 @@
+"""
+Case status events, sent through the Celery events channel.
+
+Workers (and the API) send an event whenever the status of a case changes or one of its tasks finishes.
+The API listens to these events in a background thread and pushes them to the subscribed clients,
+so clients do not need to poll the cases and tasks endpoints.
+"""
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+from celery import Task
+from celery.signals import task_failure, task_revoked, task_success
+
+from app.utils.logger import logger
+
+from .celery_app import celery_app
+
+CASE_STATUS_EVENT = "case-status"
+CASE_TASK_EVENT = "case-task"
+
+# Fields of the received events that are passed to clients
+EVENT_FIELDS = ["type", "case_id", "status", "task_id", "state", "error", "timestamp"]
+
+# Tasks that take a case id as their first argument
+CASE_TASKS = {"app.tasks.cases.create_case", "app.tasks.cases.run_case"}
+
+
+def send_case_event(event_type: str, **fields: Any) -> None:
+    """
+    Send an event about a case. Failing to send an event must not fail the case.
+    """
+    try:
+        with celery_app.events.default_dispatcher() as dispatcher:
+            dispatcher.send(event_type, **fields)
+    except Exception as e:
+        logger.warning(f"Could not send {event_type} event: {e}")
+
+
+def send_case_status_event(case_id: str, status: str) -> None:
+    send_case_event(CASE_STATUS_EVENT, case_id=case_id, status=status)
+
+
+def get_case_id(task: Optional[Task], args: Optional[Tuple[Any, ...]]) -> Optional[str]:
+    """Return the case id of a case task, or None for other tasks."""
+    if not task or task.name not in CASE_TASKS or not args:
+        return None
+    return args[0] if isinstance(args[0], str) else None
+
+
+@task_success.connect
+def on_task_success(sender: Task, **kwargs: Any) -> None:
+    case_id = get_case_id(sender, sender.request.args)
+    if case_id:
+        send_case_event(
+            CASE_TASK_EVENT, case_id=case_id, task_id=sender.request.id, state="SUCCESS"
+        )
+
+
+@task_failure.connect
+def on_task_failure(
+    sender: Task,
+    task_id: str,
+    exception: BaseException,
+    args: Tuple[Any, ...],
+    **kwargs: Any,
+) -> None:
+    case_id = get_case_id(sender, args)
+    if case_id:
+        send_case_event(
+            CASE_TASK_EVENT,
+            case_id=case_id,
+            task_id=task_id,
+            state="FAILURE",
+            error=str(exception).strip().split("\n")[-1],
+        )
+
+
+@task_revoked.connect
+def on_task_revoked(sender: Optional[Task], request: Any, **kwargs: Any) -> None:
+    case_id = get_case_id(sender, request.args)
+    if case_id:
+        send_case_event(
+            CASE_TASK_EVENT, case_id=case_id, task_id=request.id, state="REVOKED"
+        )
+
+
+class CaseEventsListener:
+    """
+    Receive case events in a background thread and fan them out to asyncio queues.
+    The thread is started with the first subscription.
+    """
+
+    QUEUE_SIZE = 1000
+    RECONNECT_DELAY = 5
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._subscribers: Set[
+            Tuple[asyncio.AbstractEventLoop, "asyncio.Queue[Dict[str, Any]]"]
+        ] = set()
+
+    def _on_event(self, event: Dict[str, Any]) -> None:
+        if event.get("type") not in (CASE_STATUS_EVENT, CASE_TASK_EVENT):
+            return
+        case_event = {k: event[k] for k in EVENT_FIELDS if k in event}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for (loop, queue) in subscribers:
+            loop.call_soon_threadsafe(self._put, queue, case_event)
+
+    @staticmethod
+    def _put(queue: "asyncio.Queue[Dict[str, Any]]", event: Dict[str, Any]) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow clients miss events rather than growing the memory usage.
+            pass
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                with celery_app.connection_for_read() as connection:
+                    receiver = celery_app.events.Receiver(
+                        connection, handlers={"*": self._on_event}
+                    )
+                    receiver.capture(limit=None, timeout=None, wakeup=False)
+            except Exception as e:
+                logger.warning(f"Lost connection to the events channel: {e}")
+                time.sleep(self.RECONNECT_DELAY)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._listen, name="case-events-listener", daemon=True
+            )
+            self._thread.start()
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator["asyncio.Queue[Dict[str, Any]]"]:
+        self._start()
+        subscriber: Tuple[
+            asyncio.AbstractEventLoop, "asyncio.Queue[Dict[str, Any]]"
+        ] = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.QUEUE_SIZE))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+
+case_events = CaseEventsListener()
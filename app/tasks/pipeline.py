@@ -0,0 +1,195 @@
+"""
+Case pipelines as graphs of checkpointed steps.
+
+Creating and running a case are split into steps that can be repeated safely.
+The state of each step is stored in the `steps` column of the case once it changes,
+so when a pipeline is run again after a failure, it resumes from the first incomplete step
+instead of starting over (e.g. a failed FATES step does not rebuild the case).
+Steps that can fail for transient reasons (e.g. downloads) are retried with a backoff.
+"""
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+from celery import Task
+
+from app import crud, models, schemas
+from app.db.session import SessionLocal
+from app.utils.logger import logger
+
+
+class Step:
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[models.CaseModel], None],
+        depends_on: Optional[List[str]] = None,
+        retries: int = 0,
+        retry_delay: int = 60,
+        queue: Optional[str] = None,
+    ):
+        """
+        Parameters
+        ----------
+        name : str
+            The name of the step, unique across all pipelines.
+        run : Callable[[models.CaseModel], None]
+            Runs the step. It must be safe to call again after a partial run.
+        depends_on : Optional[List[str]]
+            The steps that must be complete before this step.
+        retries : int
+            How many times the step is retried when it fails.
+        retry_delay : int
+            Seconds before the first retry. The delay doubles after each retry.
+        queue : Optional[str]
+            The queue of the workers that must run the step.
+            By default, the step runs in the task that runs the previous step.
+        """
+        self.name = name
+        self.run = run
+        self.depends_on = depends_on or []
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.queue = queue
+
+
+class Pipeline:
+    def __init__(self, name: str, steps: List[Step]):
+        """
+        Parameters
+        ----------
+        name : str
+            The name of the pipeline.
+        steps : List[Step]
+            The steps of the pipeline, after the steps they depend on.
+        """
+        seen_steps: Set[str] = set()
+        for step in steps:
+            missing_steps = set(step.depends_on) - seen_steps
+            if missing_steps:
+                raise ValueError(
+                    f"Step {step.name} must come after {', '.join(sorted(missing_steps))}"
+                )
+            seen_steps.add(step.name)
+
+        self.name = name
+        self.steps = steps
+
+    def get_steps_state(self, case_id: str) -> Dict[str, models.CaseStepState]:
+        """Read the state of the steps from the database, as the given case can be stale."""
+        with SessionLocal() as db:
+            case = crud.case.get(db, id=case_id)
+            return dict(case.steps or {}) if case else {}
+
+    def set_step_state(
+        self,
+        case: models.CaseModel,
+        step: Step,
+        status: schemas.TaskStatus,
+        attempts: int,
+        error: Optional[str] = None,
+    ) -> None:
+        with SessionLocal() as db:
+            crud.case.set_step_state(
+                db,
+                id=case.id,
+                step=step.name,
+                state={
+                    "status": status,
+                    "attempts": attempts,
+                    "error": error,
+                    "date_updated": datetime.now().isoformat(),
+                },
+            )
+
+    def reset(self, case: models.CaseModel) -> None:
+        with SessionLocal() as db:
+            crud.case.remove_step_states(
+                db, id=case.id, steps=[step.name for step in self.steps]
+            )
+
+    def is_complete(self, steps_state: Dict[str, models.CaseStepState]) -> bool:
+        return all(
+            steps_state.get(step.name, {}).get("status") == schemas.TaskStatus.SUCCESS
+            for step in self.steps
+        )
+
+    def hand_off(self, task: Task, case: models.CaseModel, step: Step) -> None:
+        """
+        Continue the pipeline in the queue of the given step, by replacing the task
+        with a task of the same id and group. The task of the case and the results
+        of an ensemble keep tracking the pipeline, and the replaced task
+        does not report success before the remaining steps run.
+        """
+        logger.info(f"Step {step.name} of case {case.id} is queued to {step.queue}")
+        task.replace(task.signature((case.id,), queue=step.queue))
+
+    def run(self, task: Task, case: models.CaseModel) -> bool:
+        """
+        Run the incomplete steps of the pipeline for the given case.
+        If all the steps are already complete, the pipeline is run again from the start.
+        Failed steps with retries left are retried by retrying the task.
+
+        Returns
+        -------
+        bool
+            Whether the pipeline is complete,
+            or the remaining steps are handed off to another queue.
+        """
+        delivery_info = task.request.delivery_info or {}
+        current_queue = delivery_info.get("routing_key")
+        steps_state = self.get_steps_state(case.id)
+        if self.is_complete(steps_state):
+            self.reset(case)
+            steps_state = {}
+
+        for step in self.steps:
+            step_state = steps_state.get(step.name, {})
+            if step_state.get("status") == schemas.TaskStatus.SUCCESS:
+                logger.info(f"Skipping completed step {step.name} of case {case.id}")
+                continue
+
+            if step.queue and current_queue and step.queue != current_queue:
+                self.hand_off(task, case, step)
+                return False
+
+            # Attempts are counted again when the pipeline is run again by the user.
+            attempts = step_state.get("attempts", 0) + 1 if task.request.retries else 1
+            self.set_step_state(case, step, schemas.TaskStatus.STARTED, attempts)
+            try:
+                step.run(case)
+            except Exception as e:
+                error = str(e).strip().split("\n")[-1]
+                if attempts <= step.retries:
+                    self.set_step_state(
+                        case, step, schemas.TaskStatus.RETRY, attempts, error
+                    )
+                    countdown = step.retry_delay * 2 ** (attempts - 1)
+                    logger.warning(
+                        f"Step {step.name} of case {case.id} failed, retrying in {countdown} seconds"
+                    )
+                    raise task.retry(exc=e, countdown=countdown, max_retries=None)
+                self.set_step_state(
+                    case, step, schemas.TaskStatus.FAILURE, attempts, error
+                )
+                raise
+            self.set_step_state(case, step, schemas.TaskStatus.SUCCESS, attempts)
+
+        return True
+
+    def get_steps(self, case: models.CaseModel) -> List[schemas.CaseStep]:
+        steps_state = case.steps or {}
+        return [
+            schemas.CaseStep(
+                name=step.name,
+                pipeline=self.name,
+                depends_on=step.depends_on,
+                retries=step.retries,
+                status=steps_state.get(step.name, {}).get(
+                    "status", schemas.TaskStatus.PENDING
+                ),
+                attempts=steps_state.get(step.name, {}).get("attempts", 0),
+                error=steps_state.get(step.name, {}).get("error"),
+                date_updated=steps_state.get(step.name, {}).get("date_updated"),
+            )
+            for step in self.steps
+        ]
@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Tuple
+
+from celery import states
+from celery.backends.base import KeyValueStoreBackend
+from celery.backends.database import DatabaseBackend, session_cleanup
+
+from app.core import settings
+
+from .celery_app import celery_app
+
+
+def get_tasks_meta(task_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Get the metadata of the given tasks from the result backend in a single query,
+    instead of one `AsyncResult` lookup per task.
+
+    Tasks that are not found in the backend are reported as pending,
+    which is what `AsyncResult` does too.
+
+    Returns
+    -------
+    Dict[str, Dict[str, Any]]
+        A mapping of task ids to their `status`, `result` and `traceback`.
+    """
+    task_ids = list(dict.fromkeys(task_id for task_id in task_ids if task_id))
+    if not task_ids:
+        return {}
+
+    backend = celery_app.backend
+    tasks_meta: Dict[str, Dict[str, Any]] = {}
+
+    if isinstance(backend, DatabaseBackend):
+        session = backend.ResultSession()
+        with session_cleanup(session):
+            task_cls = backend.task_cls
+            for task in session.query(task_cls).filter(task_cls.task_id.in_(task_ids)):
+                tasks_meta[task.task_id] = backend.meta_from_decoded(task.to_dict())
+    elif isinstance(backend, KeyValueStoreBackend):
+        values = backend.mget([backend.get_key_for_task(t) for t in task_ids])
+        for task_id, value in zip(task_ids, values):
+            if value is not None:
+                tasks_meta[task_id] = backend.decode_result(value)
+    else:
+        for task_id in task_ids:
+            tasks_meta[task_id] = backend.get_task_meta(task_id)
+
+    return {
+        task_id: tasks_meta.get(
+            task_id, {"status": states.PENDING, "result": None, "traceback": None}
+        )
+        for task_id in task_ids
+    }
+
+
+class TaskMetaCache:
+    """
+    An in-process LRU cache of task metadata.
+
+    Tasks in a terminal state (SUCCESS, FAILURE or REVOKED) do not change anymore,
+    so they are kept until they are forgotten or evicted.
+    Other states are kept for up to `ttl` seconds, so they are never older than that.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, task_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        tasks_meta = {}
+        with self._lock:
+            for task_id in task_ids:
+                entry = self._entries.get(task_id)
+                if entry is None:
+                    continue
+                (expires, task_meta) = entry
+                if expires < now:
+                    del self._entries[task_id]
+                    continue
+                self._entries.move_to_end(task_id)
+                tasks_meta[task_id] = task_meta
+        return tasks_meta
+
+    def set_many(self, tasks_meta: Dict[str, Dict[str, Any]]) -> None:
+        if self.maxsize <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for (task_id, task_meta) in tasks_meta.items():
+                if task_meta["status"] in states.READY_STATES:
+                    expires = float("inf")
+                elif self.ttl > 0:
+                    expires = now + self.ttl
+                else:
+                    continue
+                self._entries[task_id] = (expires, task_meta)
+                self._entries.move_to_end(task_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, task_id: str) -> None:
+        with self._lock:
+            self._entries.pop(task_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+task_meta_cache = TaskMetaCache(
+    settings.TASK_STATUS_CACHE_SIZE, settings.TASK_STATUS_CACHE_TTL
+)
+
+
+def get_cached_tasks_meta(task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Get the metadata of the given tasks like `get_tasks_meta`,
+    using the cache for the tasks it has and a single query for the others.
+    """
+    task_ids = list(dict.fromkeys(task_id for task_id in task_ids if task_id))
+    tasks_meta = task_meta_cache.get_many(task_ids)
+
+    missing_task_ids = [task_id for task_id in task_ids if task_id not in tasks_meta]
+    if missing_task_ids:
+        missing_tasks_meta = get_tasks_meta(missing_task_ids)
+        task_meta_cache.set_many(missing_tasks_meta)
+        tasks_meta.update(missing_tasks_meta)
+
+    return {task_id: tasks_meta[task_id] for task_id in task_ids}
+
+
+def forget_task(task_id: str) -> None:
+    """
+    Forget the result of the given task, in the result backend and in the cache.
+    """
+    celery_app.AsyncResult(task_id).forget()
+    task_meta_cache.delete(task_id)
@@ -1,8 +1,12 @@
-from typing import Generator
+from typing import Generator, Iterator
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
 
+from app.db.base import Base
 from app.db.session import SessionLocal
 from app.main import app
 
@@ -12,6 +16,19 @@ def db() -> Generator:
     yield SessionLocal()
 
 
+@pytest.fixture
+def memory_db() -> Iterator[Session]:
+    """A session of an empty in-memory database, for tests that do not run tasks."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        yield db
+
+
 @pytest.fixture(scope="module")
 def client() -> Generator:
     with TestClient(app) as c:
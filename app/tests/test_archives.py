@@ -0,0 +1,33 @@
+import pytest
+
+from app.utils.archives import parse_range
+
+SIZE = 1000
+
+
+@pytest.mark.parametrize(
+    ("range_header", "expected"),
+    [
+        ("bytes=0-499", (0, 499)),
+        ("bytes=500-", (500, 999)),
+        ("bytes=500-5000", (500, 999)),
+        ("bytes=-200", (800, 999)),
+        ("bytes=-5000", (0, 999)),
+    ],
+)
+def test_parse_single_range(range_header: str, expected: tuple) -> None:
+    assert parse_range(range_header, SIZE) == expected
+
+
+@pytest.mark.parametrize(
+    "range_header",
+    ["bytes=0-99,200-299", "items=0-99", "bytes=-", "bytes=500-100", "garbage"],
+)
+def test_ignore_unsupported_range(range_header: str) -> None:
+    assert parse_range(range_header, SIZE) is None
+
+
+@pytest.mark.parametrize("range_header", ["bytes=1000-", "bytes=2000-3000", "bytes=-0"])
+def test_unsatisfiable_range(range_header: str) -> None:
+    with pytest.raises(ValueError):
+        parse_range(range_header, SIZE)
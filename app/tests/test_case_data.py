@@ -0,0 +1,188 @@
+import gzip
+import hashlib
+import io
+import os
+import tracemalloc
+import zipfile
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+import requests
+from fastapi import UploadFile
+from requests.structures import CaseInsensitiveDict
+from sqlalchemy.orm import Session
+from urllib3 import HTTPResponse
+
+from app import crud, schemas
+from app.core import settings
+from app.crud.base import CRUDBase
+from app.schemas.cases import DATA_CHUNK_SIZE
+from app.utils import site_data
+
+MAX_MEMORY = 64 * 1024**2  # 64 MiB
+# Larger than MAX_MEMORY, so reading the whole upload in memory fails the test.
+DATA_SIZE = 4 * MAX_MEMORY
+DATA_URL = "https://example.org/data.zip"
+
+
+def make_synthetic_zip(path: Path, size: int) -> None:
+    """
+    Write a zip file with a file of random data of the given size, stored
+    uncompressed so the zip file is as large, without holding it in memory.
+    """
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as zf:
+        with zf.open("data.bin", "w", force_zip64=True) as f:
+            for _ in range(size // DATA_CHUNK_SIZE):
+                f.write(os.urandom(DATA_CHUNK_SIZE))
+
+
+def make_response(body: bytes, headers: Dict[str, str], status_code: int = 200) -> Any:
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers)
+    response.raw = HTTPResponse(
+        body=io.BytesIO(body),
+        headers=headers,
+        status=status_code,
+        preload_content=False,
+        decode_content=False,
+    )
+    return response
+
+
+@pytest.fixture
+def data_store(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> Path:
+    monkeypatch.setattr(settings, "DATA_STORE_ROOT", tmp_path / "store")
+    settings.DATA_STORE_ROOT.mkdir()
+    return settings.DATA_STORE_ROOT
+
+
+def test_fetch_and_store_data_memory_is_bounded(
+    data_store: Path, tmp_path: Path
+) -> None:
+    zip_path = tmp_path / "data.zip"
+    make_synthetic_zip(zip_path, DATA_SIZE)
+
+    with open(zip_path, "rb") as f:
+        upload = UploadFile("data.zip", f, content_type="application/zip")
+        tracemalloc.start()
+        try:
+            with schemas.CaseBase.fetch_data(None, upload) as (data_file_obj, digest):
+                assert data_file_obj
+                site_data.store_data(digest, data_file_obj)
+            (_, peak) = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    assert zip_path.stat().st_size > DATA_SIZE
+    assert peak < MAX_MEMORY
+    with open(zip_path, "rb") as f:
+        assert digest == hashlib.file_digest(f, "md5").hexdigest()
+    assert (site_data.get_data_path(digest) / "data.bin").stat().st_size == DATA_SIZE
+
+
+def test_fetch_data_hashes_encoded_content(
+    data_store: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as zf:
+        zf.writestr("user_mods/shell_commands", "./xmlchange PTS_LON=1\n")
+    body = gzip.compress(zip_buffer.getvalue())
+    monkeypatch.setattr(
+        requests,
+        "get",
+        lambda *args, **kwargs: make_response(
+            body, {"content-type": "application/zip", "content-encoding": "gzip"}
+        ),
+    )
+
+    with schemas.CaseBase.fetch_data("https://example.org/data.zip", None) as (
+        _,
+        digest,
+    ):
+        assert digest == hashlib.md5(body).hexdigest()
+
+
+def test_fetch_data_fails_on_http_error(
+    data_store: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(
+        requests,
+        "get",
+        lambda *args, **kwargs: make_response(
+            b"Not found", {"content-type": "application/zip"}, status_code=404
+        ),
+    )
+
+    with pytest.raises(requests.HTTPError):
+        with schemas.CaseBase.fetch_data("https://example.org/data.zip", None):
+            pass
+
+
+def make_site_data(lon: int) -> bytes:
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w") as zf:
+        zf.writestr(
+            "user_mods/shell_commands",
+            f"./xmlchange PTS_LON={lon}\n./xmlchange PTS_LAT=0\n",
+        )
+    return zip_buffer.getvalue()
+
+
+@pytest.fixture
+def url_case(
+    data_store: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> schemas.CaseBase:
+    monkeypatch.setattr(settings, "DATA_ROOT", tmp_path / "data")
+    case = schemas.CaseBase(
+        compset="2000_DATM%GSWP3v1_CLM51%FATES_SICE_SOCN_MOSART_SGLC_SWAV",
+        data_url=DATA_URL,
+    )
+    case.set_id()
+    return case
+
+
+def serve_data(monkeypatch: pytest.MonkeyPatch, body: bytes) -> None:
+    headers = {"content-type": "application/zip", "etag": hashlib.md5(body).hexdigest()}
+    monkeypatch.setattr(
+        requests, "get", lambda *args, **kwargs: make_response(body, headers)
+    )
+
+
+def test_ingest_data_takes_changed_url_data(
+    url_case: schemas.CaseBase, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    serve_data(monkeypatch, make_site_data(lon=1))
+    url_case.ingest_data()
+    old_digest = url_case.data_digest
+
+    serve_data(monkeypatch, make_site_data(lon=2))
+    url_case.ingest_data()
+
+    assert url_case.data_digest != old_digest
+    assert url_case.lon == 2
+    assert not site_data.has_data(old_digest)
+    assert site_data.has_data(url_case.data_digest)
+
+
+def test_create_finds_case_with_digest_id(
+    url_case: schemas.CaseBase, memory_db: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    serve_data(monkeypatch, make_site_data(lon=1))
+    url_case.ingest_data()
+    # A case of the same URL and arguments, whose id hashes the digest of its data.
+    digest_case = url_case.copy(update={"data_url": None}, deep=True)
+    digest_case.set_id()
+    CRUDBase.create(
+        crud.case,
+        memory_db,
+        obj_in=schemas.CaseDBCreate(**{**digest_case.dict(), "data_url": DATA_URL}),
+    )
+    new_case = url_case.copy(update={"data_digest": ""}, deep=True)
+
+    existing_case = crud.case.get_digest_case(memory_db, obj_in=new_case)
+
+    assert existing_case
+    assert existing_case.id == digest_case.id
+    assert existing_case.id != url_case.id
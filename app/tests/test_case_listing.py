@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.crud.base import CRUDBase
+
+DAY = datetime(2026, 10, 17)
+
+
+def create_case(db: Session, name: str, date_created: datetime) -> None:
+    # Stored the way crud.case.create stores new cases, without sending their task.
+    CRUDBase.create(
+        crud.case,
+        db,
+        obj_in=schemas.CaseDBCreate(
+            id=name,
+            name=name,
+            compset="2000_DATM%GSWP3v1_CLM51%FATES_SICE_SOCN_MOSART_SGLC_SWAV",
+            lat=0,
+            lon=0,
+            date_created=date_created,
+        ),
+    )
+
+
+def get_case_names(db: Session, filters: schemas.CaseFilters) -> List[str]:
+    return [
+        case.name
+        for (case, _) in crud.case.get_all_cases_with_site(db, filters=filters)
+    ]
+
+
+@pytest.fixture
+def cases(memory_db: Session) -> None:
+    create_case(memory_db, "morning", DAY.replace(hour=3))
+    create_case(memory_db, "afternoon", DAY.replace(hour=15))
+
+
+@pytest.mark.usefixtures("cases")
+def test_filter_cases_created_within_a_day(memory_db: Session) -> None:
+    noon = DAY.replace(hour=12)
+
+    assert get_case_names(memory_db, schemas.CaseFilters(created_after=noon)) == [
+        "afternoon"
+    ]
+    assert get_case_names(memory_db, schemas.CaseFilters(created_before=noon)) == [
+        "morning"
+    ]
+    assert get_case_names(
+        memory_db,
+        schemas.CaseFilters(
+            created_after=DAY.replace(hour=3), created_before=DAY.replace(hour=15)
+        ),
+    ) == ["morning"]
+
+
+@pytest.mark.usefixtures("cases")
+def test_filter_cases_with_timezone(memory_db: Session) -> None:
+    noon = DAY.replace(hour=12).astimezone(timezone(timedelta(hours=-5)))
+
+    assert get_case_names(memory_db, schemas.CaseFilters(created_after=noon)) == [
+        "afternoon"
+    ]
+
+
+def test_cases_are_stored_in_iso_format(memory_db: Session) -> None:
+    create_case(memory_db, "morning", DAY.replace(hour=3))
+
+    assert (
+        memory_db.query(models.CaseModel.date_created).scalar() == "2026-10-17T03:00:00"
+    )
@@ -0,0 +1,106 @@
+from typing import Any, Dict, List
+
+import pytest
+from celery.canvas import Signature
+from celery.exceptions import Ignore
+from celery.result import AsyncResult, GroupResult
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.crud.base import CRUDBase
+from app.tasks import cases
+from app.tasks.celery_app import CONFIGURE_QUEUE, DATA_QUEUE, celery_app
+
+TASK_IDS = ["create-task-1", "create-task-2"]
+ENSEMBLE_ID = "ensemble"
+
+
+@pytest.fixture
+def sent_tasks(monkeypatch: pytest.MonkeyPatch) -> List[Signature]:
+    sent: List[Signature] = []
+    monkeypatch.setattr(Signature, "delay", lambda sig: sent.append(sig))
+    return sent
+
+
+@pytest.fixture
+def ensemble(memory_db: Session, monkeypatch: pytest.MonkeyPatch) -> None:
+    for (index, task_id) in enumerate(TASK_IDS):
+        CRUDBase.create(
+            crud.case,
+            memory_db,
+            obj_in=schemas.CaseDBCreate(
+                id=f"case-{index}",
+                name=f"case-{index}",
+                compset="2000_DATM%GSWP3v1_CLM51%FATES_SICE_SOCN_MOSART_SGLC_SWAV",
+                status=schemas.CaseCreateStatus.INGESTING,
+                create_task_id=task_id,
+            ),
+        )
+
+    group_result = GroupResult(
+        ENSEMBLE_ID, [AsyncResult(task_id, app=celery_app) for task_id in TASK_IDS]
+    )
+    monkeypatch.setattr(
+        celery_app.GroupResult, "restore", lambda id: group_result, raising=False
+    )
+
+
+def hand_off(case: models.CaseModel, task_id: str, group_index: int) -> None:
+    """Hand the create pipeline of a case off from the data queue to the next queue."""
+    step = next(
+        step for step in cases.create_case_pipeline.steps if step.name == "create"
+    )
+    cases.create_case.push_request(
+        id=task_id,
+        args=[case.id],
+        group=ENSEMBLE_ID,
+        group_index=group_index,
+        delivery_info={"routing_key": DATA_QUEUE},
+    )
+    try:
+        cases.create_case_pipeline.hand_off(cases.create_case, case, step)
+    finally:
+        cases.create_case.pop_request()
+
+
+@pytest.mark.usefixtures("ensemble")
+def test_hand_off_keeps_the_task_of_the_case(
+    memory_db: Session, sent_tasks: List[Signature]
+) -> None:
+    case = memory_db.query(models.CaseModel).filter_by(id="case-0").one()
+
+    # The replaced task ends without a result, so it never reports success.
+    with pytest.raises(Ignore):
+        hand_off(case, TASK_IDS[0], 0)
+
+    [next_task] = sent_tasks
+    assert next_task.id == TASK_IDS[0]
+    assert next_task.args == (case.id,)
+    assert next_task.options["queue"] == CONFIGURE_QUEUE
+    assert next_task.options["group_id"] == ENSEMBLE_ID
+    memory_db.refresh(case)
+    assert case.create_task_id == TASK_IDS[0]
+
+
+@pytest.mark.usefixtures("ensemble")
+def test_get_ensemble_after_hand_off(
+    memory_db: Session, sent_tasks: List[Signature], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    for (index, case) in enumerate(memory_db.query(models.CaseModel)):
+        with pytest.raises(Ignore):
+            hand_off(case, TASK_IDS[index], index)
+
+    tasks_meta: Dict[str, Dict[str, Any]] = {
+        TASK_IDS[0]: {"status": schemas.TaskStatus.STARTED},
+        TASK_IDS[1]: {"status": schemas.TaskStatus.SUCCESS},
+    }
+    monkeypatch.setattr(crud.cases, "get_tasks_meta", lambda task_ids: tasks_meta)
+
+    ensemble = crud.case.get_ensemble(memory_db, id=ENSEMBLE_ID)
+
+    assert ensemble
+    assert ensemble.case_ids == ["case-0", "case-1"]
+    assert ensemble.task_counts == {
+        schemas.TaskStatus.STARTED: 1,
+        schemas.TaskStatus.SUCCESS: 1,
+    }
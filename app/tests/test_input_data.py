@@ -0,0 +1,119 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Iterator, List
+
+import pytest
+
+from app.utils.input_data import InputDataFetcher
+
+REL_PATH = Path("atm/datm7/forcing.nc")
+CONTENT = b"input data" * 1000
+
+
+class InputDataServer:
+    """An HTTP stand-in for INPUT_DATA_URL, serving the files of a folder."""
+
+    def __init__(self, root: Path) -> None:
+        self.requests: List[str] = []
+        server = self
+
+        class Handler(SimpleHTTPRequestHandler):
+            def do_GET(self) -> None:
+                server.requests.append(self.path)
+                # Slow enough for concurrent fetches to overlap.
+                time.sleep(0.2)
+                super().do_GET()
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self.httpd = ThreadingHTTPServer(
+            ("127.0.0.1", 0), partial(Handler, directory=str(root))
+        )
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server_root(tmp_path: Path) -> Path:
+    root = tmp_path / "server"
+    (root / REL_PATH).parent.mkdir(parents=True)
+    (root / REL_PATH).write_bytes(CONTENT)
+    return root
+
+
+@pytest.fixture
+def server(server_root: Path) -> Iterator[InputDataServer]:
+    server = InputDataServer(server_root)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def input_data_root(tmp_path: Path) -> Path:
+    root = tmp_path / "inputdata"
+    root.mkdir()
+    return root
+
+
+def get_part_files(input_data_root: Path) -> List[Path]:
+    return list(input_data_root.rglob("*.part"))
+
+
+def test_fetch_copies_from_mirror(
+    server_root: Path, server: InputDataServer, input_data_root: Path
+) -> None:
+    fetcher = InputDataFetcher(input_data_root, mirror=server_root, url=server.url)
+
+    assert fetcher.fetch(input_data_root / REL_PATH)
+    assert (input_data_root / REL_PATH).read_bytes() == CONTENT
+    assert server.requests == []
+
+
+def test_fetch_downloads_files_missing_from_mirror(
+    tmp_path: Path, server: InputDataServer, input_data_root: Path
+) -> None:
+    mirror = tmp_path / "mirror"
+    mirror.mkdir()
+    fetcher = InputDataFetcher(input_data_root, mirror=mirror, url=server.url)
+
+    assert fetcher.fetch(input_data_root / REL_PATH)
+    assert (input_data_root / REL_PATH).read_bytes() == CONTENT
+    assert server.requests == [f"/{REL_PATH.as_posix()}"]
+
+
+def test_fetch_reports_files_not_found(
+    server: InputDataServer, input_data_root: Path
+) -> None:
+    fetcher = InputDataFetcher(input_data_root, url=server.url)
+    path = input_data_root / "lnd/clm2/missing.nc"
+
+    # check_input_data is left to find the files that could not be fetched.
+    assert not fetcher.fetch(path)
+    assert fetcher.fetch_all([path, input_data_root / REL_PATH]) == [path]
+    assert not path.exists()
+    assert get_part_files(input_data_root) == []
+
+
+def test_concurrent_fetches_share_a_single_download(
+    server: InputDataServer, input_data_root: Path
+) -> None:
+    fetcher = InputDataFetcher(input_data_root, url=server.url)
+    path = input_data_root / REL_PATH
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: fetcher.fetch(path), range(8)))
+
+    assert all(results)
+    assert path.read_bytes() == CONTENT
+    assert server.requests == [f"/{REL_PATH.as_posix()}"]
+    assert get_part_files(input_data_root) == []
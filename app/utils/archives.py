@@ -0,0 +1,189 @@
+"""
+Streaming zip archives of case folders.
+
+Archives are streamed to the client while they are being created,
+and a copy is kept in `ARCHIVES_ROOT` to serve later requests, including range requests.
+Each archive is tied to a manifest of the case folder (file paths, sizes and modification times),
+so it is replaced as soon as anything in the case folder changes.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+from collections import deque
+from pathlib import Path
+from typing import Deque, Iterator, List, Optional, Tuple
+from zipfile import ZIP64_LIMIT, ZipFile, ZipInfo
+
+from app.core import settings
+from app.utils.logger import logger
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+RANGE_PATTERN = re.compile(r"^bytes=(?P<start>\d*)-(?P<end>\d*)$")
+
+
+class ZipBuffer:
+    """
+    A write-only file object for ZipFile that collects the written bytes until they are drained.
+    ZipFile uses data descriptors when the file object cannot seek, so nothing is rewritten.
+    """
+
+    def __init__(self) -> None:
+        self.chunks: Deque[bytes] = deque()
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> Iterator[bytes]:
+        while self.chunks:
+            yield self.chunks.popleft()
+
+
+def get_case_files(case_path: Path) -> List[Path]:
+    """
+    Return the files and folders to archive for the given case. Symlinks are skipped.
+    """
+    return sorted(f for f in case_path.rglob("*") if not f.is_symlink())
+
+
+def get_case_etag(case_path: Path, files: List[Path]) -> str:
+    """
+    Return a hash of the paths, sizes and modification times of the given files.
+    It changes whenever a file in the case folder is added, removed or modified.
+    """
+    manifest = []
+    for f in files:
+        try:
+            stat = f.stat()
+        except FileNotFoundError:
+            # The file was removed since the case folder was listed, e.g. by a run.
+            continue
+        manifest.append((str(f.relative_to(case_path)), stat.st_size, stat.st_mtime_ns))
+    return hashlib.md5(json.dumps(manifest).encode("utf-8")).hexdigest()
+
+
+def get_archive_path(case_folder_name: str, etag: str) -> Path:
+    return settings.ARCHIVES_ROOT / f"{case_folder_name}.{etag}.zip"
+
+
+def remove_stale_archives(case_folder_name: str, etag: Optional[str] = None) -> None:
+    """
+    Remove the archives of the case that do not match the given etag.
+    If etag is not given, all the archives of the case are removed.
+    """
+    current_archive = get_archive_path(case_folder_name, etag) if etag else None
+    for archive in settings.ARCHIVES_ROOT.glob(f"{case_folder_name}.*zip"):
+        if archive != current_archive:
+            archive.unlink(missing_ok=True)
+
+
+def iter_zip(
+    case_path: Path, files: List[Path], archive_path: Optional[Path] = None
+) -> Iterator[bytes]:
+    """
+    Yield a zip archive of the given files as it is being created.
+    If archive_path is given, the archive is also saved there once it is complete.
+    Files that are removed while the archive is created are skipped,
+    and the archive is not saved then, as it does not match the listed files.
+    """
+    buffer = ZipBuffer()
+    complete = True
+    archive_file = None
+    if archive_path:
+        (fd, tmp_archive_path) = tempfile.mkstemp(
+            dir=archive_path.parent, prefix=".", suffix=".zip"
+        )
+        archive_file = os.fdopen(fd, "wb")
+
+    def drain() -> Iterator[bytes]:
+        for chunk in buffer.drain():
+            if archive_file:
+                archive_file.write(chunk)
+            yield chunk
+
+    try:
+        with ZipFile(buffer, "w") as zf:  # type: ignore[call-overload]
+            for f in files:
+                try:
+                    zinfo = ZipInfo.from_file(f, arcname=f.relative_to(case_path))
+                    if zinfo.is_dir():
+                        zf.writestr(zinfo, b"")
+                        continue
+                    src = open(f, "rb")
+                except FileNotFoundError:
+                    complete = False
+                    continue
+                with src, zf.open(
+                    zinfo, "w", force_zip64=zinfo.file_size > ZIP64_LIMIT
+                ) as dest:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):  # noqa: B023
+                        dest.write(chunk)
+                        yield from drain()
+        yield from drain()
+
+        if archive_file and archive_path and complete:
+            archive_file.close()
+            os.replace(tmp_archive_path, archive_path)
+    finally:
+        if archive_file:
+            archive_file.close()
+            if os.path.exists(tmp_archive_path):
+                # The client disconnected or files were removed meanwhile.
+                logger.info(f"Discarding incomplete archive of {case_path}")
+                os.remove(tmp_archive_path)
+
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single byte range from a Range header.
+
+    Returns
+    -------
+    Optional[Tuple[int, int]]
+        The inclusive start and end of the range,
+        or None if the header uses multiple ranges or an unsupported format,
+        in which case it should be ignored and the full file sent.
+
+    Raises
+    ------
+    ValueError
+        If the range is not satisfiable for a file of the given size.
+    """
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match or (not match.group("start") and not match.group("end")):
+        return None
+
+    if not match.group("start"):
+        # A suffix range, e.g. bytes=-500 for the last 500 bytes
+        suffix_length = int(match.group("end"))
+        if suffix_length == 0 or size == 0:
+            raise ValueError(f"Range {range_header} is not satisfiable")
+        return (max(size - suffix_length, 0), size - 1)
+
+    start = int(match.group("start"))
+    end = int(match.group("end")) if match.group("end") else size - 1
+    if start > end and match.group("end"):
+        # An invalid range, which is ignored like any other unsupported format
+        return None
+    if start >= size:
+        raise ValueError(f"Range {range_header} is not satisfiable")
+
+    return (start, min(end, size - 1))
+
+
+def iter_file_range(path: Path, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,206 @@
+"""
+A content-addressed cache of model builds.
+
+Cases that share the same compset, driver, model version and build configuration
+produce identical libraries and executables, so the output of `./case.build` is stored
+under `BUILD_CACHE_ROOT/<build key>` and copied into the EXEROOT (and SHAREDLIBROOT)
+of matching cases instead of building them again.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from app import models, schemas
+from app.core import settings
+from app.utils.logger import logger
+
+MANIFEST_FILE = "manifest.json"
+EXEROOT_DIR = "exeroot"
+SHAREDLIBROOT_DIR = "sharedlibroot"
+
+
+def get_run_xml_vars(case_path: Path) -> Set[str]:
+    """
+    Return the ids of the variables defined in `env_run.xml` of the case.
+    These variables are only used at run time, so they do not affect the build.
+    """
+    try:
+        tree = ET.parse(case_path / "env_run.xml")
+    except (FileNotFoundError, ET.ParseError):
+        return set()
+    return {entry.attrib["id"] for entry in tree.iter("entry") if "id" in entry.attrib}
+
+
+def get_source_mods_digest(case_path: Path) -> str:
+    """
+    Return a digest of the files in the SourceMods folder of the case.
+    Source modifications can come from user_mods and are compiled into the model.
+    """
+    digest = hashlib.md5()
+    source_mods_path = case_path / "SourceMods"
+    if source_mods_path.exists():
+        for f in sorted(source_mods_path.rglob("*")):
+            if f.is_file():
+                digest.update(str(f.relative_to(source_mods_path)).encode("utf-8"))
+                digest.update(f.read_bytes())
+    return digest.hexdigest()
+
+
+def get_build_key(case: models.CaseModel, case_path: Path) -> str:
+    """
+    The build key is a hash of the case attributes that affect the build.
+    Variables of `xml_var` category are included unless they are run time variables.
+    """
+    run_xml_vars = get_run_xml_vars(case_path)
+    build_xml_vars: List[str] = []
+    for variable_dict in case.variables:
+        variable = schemas.CaseVariable(**variable_dict)
+        variable_config = schemas.CaseVariableConfig.get_variable_config(variable.name)
+        if (
+            not variable_config
+            or variable_config.category != schemas.VariableCategory.xml_var
+            or variable.name in run_xml_vars
+        ):
+            continue
+        value = (
+            ",".join(map(lambda v: str(v), variable.value))
+            if isinstance(variable.value, list)
+            else str(variable.value)
+        )
+        build_xml_vars.append(f"{variable.name}={value}")
+
+    hash_parts = "_".join(
+        [
+            case.compset,
+            case.driver,
+            case.model_version,
+            settings.MACHINE_NAME,
+            json.dumps(sorted(build_xml_vars)),
+            get_source_mods_digest(case_path),
+        ]
+    )
+    return hashlib.md5(bytes(hash_parts.encode("utf-8"))).hexdigest()
+
+
+def copy_tree_atomic(src: Path, dst: Path) -> None:
+    """
+    Replace dst with a copy of src.
+    The copy is made in a temporary folder first and then moved in place,
+    so dst is left as it was if the copy fails, e.g. if the build is evicted meanwhile.
+    """
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = Path(tempfile.mkdtemp(prefix=f".{dst.name}-", dir=dst.parent))
+    try:
+        shutil.copytree(src, tmp_path, symlinks=True, dirs_exist_ok=True)
+        if dst.exists():
+            shutil.rmtree(dst)
+        os.rename(tmp_path, dst)
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def restore_build(
+    build_key: str, exeroot: Path, sharedlibroot: Path
+) -> Optional[Dict[str, str]]:
+    """
+    Copy a cached build into the given EXEROOT and SHAREDLIBROOT.
+
+    Returns
+    -------
+    Optional[Dict[str, str]]
+        The xml variables recorded with the cached build, which must be set on the case,
+        or None if there is no cached build for the given key.
+    """
+    entry_path = settings.BUILD_CACHE_ROOT / build_key
+    try:
+        with open(entry_path / MANIFEST_FILE, "r") as f:
+            manifest = json.load(f)
+
+        logger.info(f"Restoring build {build_key} to {exeroot}")
+        copy_tree_atomic(entry_path / EXEROOT_DIR, exeroot)
+        if (entry_path / SHAREDLIBROOT_DIR).exists():
+            copy_tree_atomic(entry_path / SHAREDLIBROOT_DIR, sharedlibroot)
+        # The modification time of an entry marks when it was last used.
+        os.utime(entry_path)
+    except (OSError, json.JSONDecodeError) as e:
+        if entry_path.exists():
+            logger.warning(f"Could not restore build {build_key}: {e}")
+        return None
+
+    return manifest["xml_vars"]
+
+
+def get_dir_size(path: Path) -> int:
+    return sum(f.lstat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def store_build(
+    build_key: str, exeroot: Path, sharedlibroot: Path, xml_vars: Dict[str, str]
+) -> None:
+    """
+    Add the build in the given EXEROOT and SHAREDLIBROOT to the cache.
+    The build is copied to a temporary folder first and then moved in place,
+    so other workers never see a partial entry.
+    """
+    entry_path = settings.BUILD_CACHE_ROOT / build_key
+    if entry_path.exists():
+        return
+
+    logger.info(f"Storing build {build_key} from {exeroot}")
+    tmp_path = Path(tempfile.mkdtemp(prefix=".", dir=settings.BUILD_CACHE_ROOT))
+    try:
+        shutil.copytree(exeroot, tmp_path / EXEROOT_DIR, symlinks=True)
+        if sharedlibroot.resolve() != exeroot.resolve() and sharedlibroot.exists():
+            shutil.copytree(sharedlibroot, tmp_path / SHAREDLIBROOT_DIR, symlinks=True)
+        with open(tmp_path / MANIFEST_FILE, "w") as f:
+            json.dump(
+                {
+                    "size": get_dir_size(tmp_path),
+                    "date_created": time.time(),
+                    "xml_vars": xml_vars,
+                },
+                f,
+            )
+        os.rename(tmp_path, entry_path)
+    except OSError as e:
+        # Either another worker stored the same build first, or the copy failed.
+        # Neither should fail the case.
+        logger.warning(f"Could not store build {build_key}: {e}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        return
+
+    evict_builds(keep=build_key)
+
+
+def evict_builds(keep: Optional[str] = None) -> None:
+    """
+    Remove the least recently used builds until the cache fits in BUILD_CACHE_MAX_SIZE_GB.
+    """
+    max_size = settings.BUILD_CACHE_MAX_SIZE_GB * 1024**3
+    entries = []
+    for entry_path in settings.BUILD_CACHE_ROOT.iterdir():
+        if entry_path.name.startswith("."):
+            # Temporary folders of builds being stored
+            continue
+        try:
+            with open(entry_path / MANIFEST_FILE, "r") as f:
+                size = json.load(f)["size"]
+            entries.append((entry_path.stat().st_mtime, size, entry_path))
+        except (OSError, json.JSONDecodeError):
+            continue
+
+    total_size = sum(size for (_, size, _) in entries)
+    for (_, size, entry_path) in sorted(entries):
+        if total_size <= max_size:
+            break
+        if entry_path.name == keep:
+            continue
+        logger.info(f"Evicting build {entry_path.name} from the build cache")
+        shutil.rmtree(entry_path, ignore_errors=True)
+        total_size -= size
@@ -0,0 +1,49 @@
+"""
+Per-case, per-step log files.
+
+The output of the commands run for a case is written to `LOGS_ROOT/<case folder>/<step>.log`
+while the commands are running. Logs are kept outside the case folder,
+because the case folder is recreated when a case is created again.
+"""
+import re
+from pathlib import Path
+from typing import List, Tuple
+
+from app.core import settings
+
+STEP_PATTERN = re.compile(r"^[\w.-]+$")
+
+# Length of the end of a failed step's log that is included in the error.
+ERROR_TAIL_SIZE = 2048
+
+
+def get_step_name(cmd: List[str]) -> str:
+    """Return the step name for a command, e.g. case.build for ./case.build."""
+    return Path(cmd[0]).name
+
+
+def get_logs_path(case_folder_name: str) -> Path:
+    return settings.LOGS_ROOT / case_folder_name
+
+
+def get_log_path(case_folder_name: str, step: str) -> Path:
+    if not STEP_PATTERN.match(step):
+        raise ValueError(f"Invalid step name: {step}")
+    return get_logs_path(case_folder_name) / f"{step}.log"
+
+
+def read_log(path: Path, offset: int, limit: int) -> Tuple[bytes, int, int]:
+    """
+    Read up to `limit` bytes of a log file starting at `offset`.
+    A negative offset is counted from the end of the file.
+
+    Returns
+    -------
+    Tuple[bytes, int, int]
+        The content, the offset it starts at, and the size of the file when it was read.
+    """
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+        start = max(size + offset, 0) if offset < 0 else min(offset, size)
+        f.seek(start)
+        return (f.read(limit), start, size)
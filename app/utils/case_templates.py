@@ -0,0 +1,108 @@
+"""
+A pool of cases that are created and set up once, and cloned for new cases.
+
+`create_newcase` and `./case.setup` give the same result for cases with the same
+compset, driver, resolution, machine, model version and user_mods,
+so new cases are cloned from a template case set up with these attributes.
+Only the case specific changes are applied to the clones.
+Templates of other model versions are removed when a new template is created.
+"""
+import hashlib
+import json
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+from app import models
+from app.core import settings
+from app.utils.logger import logger
+
+MANIFEST_FILE = "template.json"
+LOG_FILE = "template.log"
+TEMPLATE_CASE_DIR = "case"
+RESOLUTION = "CLM_USRDAT"
+
+# The shell commands of user_mods are written for each case by the API,
+# and applied to the clones separately.
+CASE_SPECIFIC_USER_MODS = {"shell_commands"}
+
+
+def get_user_mods_digest(user_mods_path: Path) -> str:
+    digest = hashlib.md5()
+    if user_mods_path.exists():
+        for f in sorted(user_mods_path.rglob("*")):
+            if f.is_file() and f.name not in CASE_SPECIFIC_USER_MODS:
+                digest.update(str(f.relative_to(user_mods_path)).encode("utf-8"))
+                digest.update(f.read_bytes())
+    return digest.hexdigest()
+
+
+def get_template_key(case: models.CaseModel) -> str:
+    hash_parts = "_".join(
+        [
+            case.compset,
+            case.driver,
+            RESOLUTION,
+            settings.MACHINE_NAME,
+            settings.MODEL_VERSION,
+            get_user_mods_digest(Path(case.env["CASE_DATA_ROOT"]) / "user_mods"),
+        ]
+    )
+    return hashlib.md5(bytes(hash_parts.encode("utf-8"))).hexdigest()
+
+
+def get_template_root(template_key: str) -> Path:
+    return settings.CASE_TEMPLATES_ROOT / template_key
+
+
+def get_template_case_path(template_key: str) -> Path:
+    return get_template_root(template_key) / TEMPLATE_CASE_DIR
+
+
+def get_lock_path(template_key: str) -> Path:
+    return settings.CASE_TEMPLATES_ROOT / f"{template_key}.lock"
+
+
+def get_log_path(template_key: str) -> Path:
+    """The output of the commands that create and set up the template case."""
+    return get_template_root(template_key) / LOG_FILE
+
+
+def is_template_ready(template_key: str) -> bool:
+    """The manifest is written once the template case is set up."""
+    return (get_template_root(template_key) / MANIFEST_FILE).exists()
+
+
+def save_template(template_key: str, case: models.CaseModel) -> None:
+    with open(get_template_root(template_key) / MANIFEST_FILE, "w") as f:
+        json.dump(
+            {
+                "compset": case.compset,
+                "driver": case.driver,
+                "resolution": RESOLUTION,
+                "model_version": settings.MODEL_VERSION,
+                "date_created": datetime.now().isoformat(),
+            },
+            f,
+        )
+
+
+def remove_template(template_key: str) -> None:
+    shutil.rmtree(get_template_root(template_key), ignore_errors=True)
+
+
+def remove_stale_templates() -> None:
+    """
+    Remove the templates created with other model versions.
+    """
+    for template_root in settings.CASE_TEMPLATES_ROOT.iterdir():
+        if not template_root.is_dir():
+            continue
+        try:
+            with open(template_root / MANIFEST_FILE, "r") as f:
+                model_version = json.load(f)["model_version"]
+        except (FileNotFoundError, ValueError, KeyError):
+            continue
+        if model_version != settings.MODEL_VERSION:
+            logger.info(f"Removing case template {template_root.name}")
+            shutil.rmtree(template_root, ignore_errors=True)
@@ -0,0 +1,76 @@
+"""
+A core budget shared by the worker processes on the same machine.
+
+Builds and runs reserve cores from the budget while they are running,
+so concurrent builds share the free cores instead of each using all of them.
+Reservations are kept in a file in the temporary folder of the machine,
+along with the process that holds them, so reservations of processes that died are released.
+"""
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator
+
+from app.core import settings
+from app.utils.locks import file_lock
+from app.utils.logger import logger
+
+RESERVATIONS_PATH = Path(tempfile.gettempdir()) / "ctsm-api-cores.json"
+
+
+def is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_reservations() -> Dict[str, Dict[str, int]]:
+    try:
+        reservations = json.loads(RESERVATIONS_PATH.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+    return {
+        key: reservation
+        for key, reservation in reservations.items()
+        if is_process_alive(reservation["pid"])
+    }
+
+
+def write_reservations(reservations: Dict[str, Dict[str, int]]) -> None:
+    RESERVATIONS_PATH.write_text(json.dumps(reservations))
+
+
+@contextmanager
+def reserve_cores(key: str, max_cores: int, min_cores: int = 1) -> Iterator[int]:
+    """
+    Reserve up to max_cores of the free cores while the context is active.
+    At least min_cores are reserved, even if fewer cores are free.
+
+    Yields
+    ------
+    int
+        The number of reserved cores.
+    """
+    with file_lock(RESERVATIONS_PATH.with_suffix(".lock")):
+        reservations = read_reservations()
+        free_cores = settings.WORKER_CORES - sum(
+            r["cores"] for r in reservations.values()
+        )
+        cores = max(min(max_cores, free_cores), min_cores)
+        reservations[key] = {"pid": os.getpid(), "cores": cores}
+        write_reservations(reservations)
+
+    logger.info(f"Reserved {cores} of {max(free_cores, 0)} free cores for {key}")
+    try:
+        yield cores
+    finally:
+        with file_lock(RESERVATIONS_PATH.with_suffix(".lock")):
+            reservations = read_reservations()
+            reservations.pop(key, None)
+            write_reservations(reservations)
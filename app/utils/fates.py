@@ -0,0 +1,64 @@
+"""
+In-process editing of FATES parameter files.
+
+This replaces calling `modify_fates_paramfile.py` once for every PFT value
+and `FatesPFTIndexSwapper.py` afterwards, which opens and rewrites the whole file each time.
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List, Mapping, Optional, Sequence, Union
+
+import xarray as xr
+
+PFT_DIM = "fates_pft"
+
+ParamValue = Union[int, float, str, bool]
+
+
+def update_fates_paramfile(
+    param_path: Path,
+    params: Mapping[str, Sequence[ParamValue]],
+    pft_indices: Optional[List[int]] = None,
+) -> None:
+    """
+    Apply all the parameter edits and the PFT index selection in a single read and write.
+
+    Parameters
+    ----------
+    param_path : Path
+        The FATES parameter file to update in place.
+    params : Mapping[str, Sequence[ParamValue]]
+        A mapping of parameter names to their values, one value per PFT,
+        in the PFT order of the original file.
+        Only parameters with a PFT dimension can be set.
+    pft_indices : Optional[List[int]]
+        One-based indices of the PFTs to keep, in the order they must appear in the output file.
+        It does the same as `FatesPFTIndexSwapper.py`.
+    """
+    # Decoding is disabled so variables are written back with their original types and attributes.
+    with xr.open_dataset(param_path, decode_cf=False) as ds:
+        ds = ds.load()
+
+    for param_name, values in params.items():
+        if param_name not in ds.variables:
+            raise ValueError(f"Parameter {param_name} not found in {param_path}")
+        param = ds[param_name]
+        if PFT_DIM not in param.dims:
+            raise ValueError(f"Parameter {param_name} has no {PFT_DIM} dimension")
+        for idx, value in enumerate(values):
+            param[{PFT_DIM: idx}] = value
+
+    if pft_indices:
+        ds = ds.isel({PFT_DIM: [int(index) - 1 for index in pft_indices]})
+
+    # Write to a temporary file first, so the parameter file is never left half-written.
+    (fd, output) = tempfile.mkstemp(dir=param_path.parent, suffix=".nc")
+    os.close(fd)
+    try:
+        ds.to_netcdf(output)
+        shutil.move(output, param_path)
+    finally:
+        if os.path.exists(output):
+            os.remove(output)
@@ -0,0 +1,214 @@
+"""
+Reading of the model history output of cases.
+
+History files are opened lazily one at a time, in time order,
+and only the selected variables over the selected time window are read from each file.
+The rows are encoded and streamed file by file, so memory usage depends on the size of
+a single history file (or of a resampling period), not on the length of the run.
+"""
+import csv
+import io
+import json
+import math
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import xarray as xr
+from pandas.tseries.frequencies import to_offset
+
+from app import schemas
+
+TIME_DIM = "time"
+
+# e.g. case.clm2.h0.2000-01-01-00000.nc, where the tape is clm2.h0
+HISTORY_FILE_PATTERN = re.compile(
+    r"\.(?P<tape>[a-z0-9_]+\.h\d+[a-z]?)\.\d{4}-\d{2}(?:-\d{2})?(?:-\d{5})?\.nc$"
+)
+
+MEDIA_TYPES = {
+    schemas.HistoryFormat.json: "application/json",
+    schemas.HistoryFormat.csv: "text/csv",
+    schemas.HistoryFormat.arrow: "application/vnd.apache.arrow.stream",
+}
+
+
+def get_history_files(case_path: Path) -> Dict[str, List[Path]]:
+    """
+    Return the history files of the case by history tape, in time order.
+    Files are looked up in the run folder and in the short-term archive.
+    """
+    files: Dict[str, Dict[str, Path]] = {}
+    for folder in [case_path / "run", *sorted((case_path / "archive").glob("*/hist"))]:
+        for f in folder.glob("*.nc"):
+            match = HISTORY_FILE_PATTERN.search(f.name)
+            if match:
+                files.setdefault(match.group("tape"), {})[f.name] = f
+    return {
+        tape: [tape_files[name] for name in sorted(tape_files)]
+        for tape, tape_files in sorted(files.items())
+    }
+
+
+def get_history_variables(history_file: Path) -> List[schemas.HistoryVariable]:
+    """Return the time dependent variables of the given history file."""
+    with xr.open_dataset(history_file, decode_times=False) as ds:
+        return [
+            schemas.HistoryVariable(
+                name=name,
+                long_name=variable.attrs.get("long_name"),
+                units=variable.attrs.get("units"),
+                dims=list(variable.dims),
+            )
+            for (name, variable) in ds.data_vars.items()
+            if TIME_DIM in variable.dims
+        ]
+
+
+def validate_resample(resample: str) -> None:
+    try:
+        to_offset(resample)
+    except ValueError:
+        raise ValueError(f"Invalid resampling frequency: {resample}")
+
+
+def iter_history(
+    files: List[Path],
+    variables: List[str],
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> Iterator[xr.Dataset]:
+    """
+    Yield the selected variables over the selected time window, one history file at a time.
+    Model calendars (e.g. noleap) are decoded to cftime dates.
+    """
+    for f in files:
+        with xr.open_dataset(f, use_cftime=True) as ds:
+            selection = ds[variables]
+            if start or end:
+                selection = selection.sel({TIME_DIM: slice(start, end)})
+            if selection.sizes.get(TIME_DIM, 0):
+                yield selection.load()
+
+
+def resample_history(chunks: Iterable[xr.Dataset], freq: str) -> Iterator[xr.Dataset]:
+    """
+    Yield the means of the given data over resampling periods.
+    Periods are labelled by their start. Rows of a period that may continue
+    in the next history file are kept until that file is read.
+    """
+    pending: Optional[xr.Dataset] = None
+    for chunk in chunks:
+        if pending is not None:
+            chunk = xr.concat([pending, chunk], dim=TIME_DIM)
+        resampled = chunk.resample({TIME_DIM: freq}, closed="left", label="left").mean()
+        last_period_start = resampled[TIME_DIM].values[-1]
+        pending = chunk.sel({TIME_DIM: chunk[TIME_DIM] >= last_period_start})
+        if resampled.sizes[TIME_DIM] > 1:
+            yield resampled.isel({TIME_DIM: slice(None, -1)})
+
+    if pending is not None:
+        yield pending.resample({TIME_DIM: freq}, closed="left", label="left").mean()
+
+
+def to_columns(chunk: xr.Dataset, variables: List[str]) -> List[Tuple[str, np.ndarray]]:
+    """
+    Flatten the given data to columns. Variables with other dimensions than time
+    (e.g. soil levels) get one column for each of their other elements, as `NAME[index]`.
+    """
+    columns: List[Tuple[str, np.ndarray]] = [
+        (TIME_DIM, np.array([t.isoformat() for t in chunk[TIME_DIM].values]))
+    ]
+    for name in variables:
+        variable = chunk[name].transpose(TIME_DIM, ...)
+        values = variable.values.reshape(variable.sizes[TIME_DIM], -1)
+        if values.shape[1] == 1:
+            columns.append((name, values[:, 0]))
+        else:
+            columns.extend(
+                (f"{name}[{index}]", values[:, index])
+                for index in range(values.shape[1])
+            )
+    return columns
+
+
+def to_json_value(value: Any) -> Any:
+    value = value.item() if isinstance(value, np.generic) else value
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def encode_json(
+    columns_chunks: Iterable[List[Tuple[str, np.ndarray]]]
+) -> Iterator[bytes]:
+    """Encode the rows as a JSON array of objects."""
+    yield b"["
+    first = True
+    for columns in columns_chunks:
+        names = [name for (name, _) in columns]
+        rows = []
+        for row in zip(*(values for (_, values) in columns)):
+            rows.append(json.dumps(dict(zip(names, map(to_json_value, row)))))
+        if rows:
+            yield (("" if first else ",") + ",".join(rows)).encode("utf-8")
+            first = False
+    yield b"]"
+
+
+def encode_csv(
+    columns_chunks: Iterable[List[Tuple[str, np.ndarray]]]
+) -> Iterator[bytes]:
+    header_written = False
+    for columns in columns_chunks:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not header_written:
+            writer.writerow([name for (name, _) in columns])
+            header_written = True
+        writer.writerows(zip(*(values for (_, values) in columns)))
+        yield buffer.getvalue().encode("utf-8")
+
+
+def encode_arrow(
+    columns_chunks: Iterable[List[Tuple[str, np.ndarray]]]
+) -> Iterator[bytes]:
+    """Encode the rows as an Arrow IPC stream, with one record batch for each chunk."""
+    sink = io.BytesIO()
+    writer = None
+    for columns in columns_chunks:
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(values) for (_, values) in columns],
+            names=[name for (name, _) in columns],
+        )
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, batch.schema)
+        writer.write_batch(batch)
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    if writer is not None:
+        writer.close()
+        yield sink.getvalue()
+
+
+def stream_history(
+    files: List[Path],
+    variables: List[str],
+    output_format: schemas.HistoryFormat,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    resample: Optional[str] = None,
+) -> Iterator[bytes]:
+    chunks = iter_history(files, variables, start, end)
+    if resample:
+        chunks = resample_history(chunks, resample)
+    columns_chunks = (to_columns(chunk, variables) for chunk in chunks)
+
+    if output_format == schemas.HistoryFormat.csv:
+        return encode_csv(columns_chunks)
+    if output_format == schemas.HistoryFormat.arrow:
+        return encode_arrow(columns_chunks)
+    return encode_json(columns_chunks)
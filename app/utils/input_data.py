@@ -0,0 +1,157 @@
+"""
+A shared fetcher for the model input data in `CESMDATAROOT`.
+
+All cases share the same input data folder, so cases that start at the same time
+would otherwise download the same files with `./check_input_data --download`.
+Each file is fetched under a file lock: the first case downloads it to a temporary file
+and moves it in place, and the other cases wait for the lock and find the file ready.
+Files are copied from `INPUT_DATA_MIRROR` when it has them, and downloaded from
+`INPUT_DATA_URL` otherwise.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+import requests
+
+from app.core import settings
+from app.utils.locks import file_lock
+from app.utils.logger import logger
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+DOWNLOAD_TIMEOUT = 60
+LOCKS_DIR = ".locks"
+
+
+def get_input_data_files(case_path: Path, input_data_root: Path) -> List[Path]:
+    """
+    Return the input data files of the case that are under input_data_root.
+    The files are listed in `Buildconf/*.input_data_list` by `./preview_namelists`.
+    """
+    files = set()
+    for input_data_list in (case_path / "Buildconf").glob("*.input_data_list"):
+        for line in input_data_list.read_text().splitlines():
+            (_, sep, value) = line.partition("=")
+            if not sep:
+                continue
+            path = Path(value.strip())
+            if path.is_absolute() and path.is_relative_to(input_data_root):
+                files.add(path)
+    return sorted(files)
+
+
+class InputDataFetcher:
+    def __init__(
+        self,
+        input_data_root: Path,
+        mirror: Optional[Path] = None,
+        url: Optional[str] = None,
+    ):
+        self.input_data_root = input_data_root
+        self.mirror = mirror
+        self.url = url.rstrip("/") if url else None
+
+    def get_lock_path(self, path: Path) -> Path:
+        rel_path = str(path.relative_to(self.input_data_root))
+        lock_name = hashlib.md5(rel_path.encode("utf-8")).hexdigest()
+        return self.input_data_root / LOCKS_DIR / f"{lock_name}.lock"
+
+    def _copy_to(self, rel_path: Path, dest: Path) -> bool:
+        if self.mirror and (self.mirror / rel_path).is_file():
+            with open(self.mirror / rel_path, "rb") as src, open(dest, "wb") as f:
+                shutil.copyfileobj(src, f, CHUNK_SIZE)
+            return True
+
+        if self.url:
+            response = requests.get(
+                f"{self.url}/{rel_path.as_posix()}",
+                stream=True,
+                timeout=DOWNLOAD_TIMEOUT,
+            )
+            try:
+                if response.status_code == 404:
+                    return False
+                response.raise_for_status()
+                with open(dest, "wb") as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+            finally:
+                response.close()
+            return True
+
+        return False
+
+    def fetch(self, path: Path) -> bool:
+        """
+        Fetch the given file if it does not exist.
+        Concurrent calls for the same file wait for a single transfer.
+
+        Returns
+        -------
+        bool
+            Whether the file exists after the call.
+        """
+        if path.exists():
+            return True
+
+        with file_lock(self.get_lock_path(path)):
+            if path.exists():
+                # Fetched by another case while waiting for the lock
+                return True
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Partial files are never visible under the final path.
+            (fd, tmp_path) = tempfile.mkstemp(
+                dir=path.parent, prefix=f".{path.name}.", suffix=".part"
+            )
+            os.close(fd)
+            try:
+                rel_path = path.relative_to(self.input_data_root)
+                if not self._copy_to(rel_path, Path(tmp_path)):
+                    return False
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.warning(f"Could not fetch {path}: {e}")
+                return False
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        logger.info(f"Fetched {path}")
+        return True
+
+    def fetch_all(self, paths: List[Path], max_workers: int = 4) -> List[Path]:
+        """
+        Fetch the given files in parallel and return the ones that could not be fetched.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            fetched = list(executor.map(self.fetch, paths))
+        return [path for (path, ok) in zip(paths, fetched) if not ok]
+
+
+def get_input_data_fetcher() -> InputDataFetcher:
+    return InputDataFetcher(
+        settings.CESMDATAROOT,
+        mirror=settings.INPUT_DATA_MIRROR,
+        url=settings.INPUT_DATA_URL,
+    )
+
+
+def fetch_case_input_data(case_path: Path) -> List[Path]:
+    """
+    Fetch the missing input data files of the case
+    and return the ones that could not be fetched.
+    """
+    fetcher = get_input_data_fetcher()
+    files = get_input_data_files(case_path, fetcher.input_data_root)
+    missing_files = fetcher.fetch_all(
+        [f for f in files if not f.exists()],
+        max_workers=settings.INPUT_DATA_MAX_DOWNLOADS,
+    )
+    for f in missing_files:
+        logger.warning(f"Input data file {f} could not be fetched")
+    return missing_files
@@ -0,0 +1,134 @@
+"""
+Prometheus metrics for the API and the case pipeline.
+
+Histograms are recorded in the API and the worker processes.
+When `PROMETHEUS_MULTIPROC_DIR` is set, every process writes its metrics to that folder,
+and the `/metrics` endpoint aggregates the folders of all the services under `METRICS_ROOT`.
+Queue depth and case counts are read from the broker and the database on each scrape.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator, List
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+from sqlalchemy import func
+
+from app import models
+from app.core import settings
+from app.db.session import SessionLocal
+from app.tasks.celery_app import celery_app
+from app.utils.logger import logger
+
+if TYPE_CHECKING:
+    from app.models import CaseModel
+
+# Pipeline stages take from seconds (xmlchange) to hours (case.build).
+STAGE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200, float("inf"))
+
+PIPELINE_STAGE_DURATION = Histogram(
+    "ctsm_pipeline_stage_duration_seconds",
+    "Duration of the case pipeline stages.",
+    ["stage", "compset", "driver", "success"],
+    buckets=STAGE_BUCKETS,
+)
+
+REQUEST_DURATION = Histogram(
+    "ctsm_http_request_duration_seconds",
+    "Duration of the API requests.",
+    ["method", "route", "status_code"],
+)
+
+
+def observe_stage(
+    stage: str, case: "CaseModel", duration: float, success: bool
+) -> None:
+    PIPELINE_STAGE_DURATION.labels(
+        stage=stage,
+        compset=case.compset,
+        driver=case.driver,
+        success=str(success).lower(),
+    ).observe(duration)
+
+
+@contextmanager
+def time_stage(stage: str, case: "CaseModel") -> Iterator[None]:
+    """Record the duration of the wrapped stage, which fails if it raises."""
+    start = time.time()
+    success = False
+    try:
+        yield
+        success = True
+    finally:
+        observe_stage(stage, case, time.time() - start, success)
+
+
+def observe_request(method: str, route: str, status_code: int, duration: float) -> None:
+    REQUEST_DURATION.labels(
+        method=method, route=route, status_code=str(status_code)
+    ).observe(duration)
+
+
+def get_queue_names() -> List[str]:
+    queues = celery_app.conf.task_queues
+    if queues:
+        return [q.name for q in queues]
+    return [celery_app.conf.task_default_queue]
+
+
+class LiveCollector(Collector):
+    """
+    Collect the metrics that are read on each scrape, instead of being recorded by the processes.
+    """
+
+    def collect(self) -> Iterator[Metric]:
+        queue_depth = GaugeMetricFamily(
+            "ctsm_celery_queue_depth",
+            "Number of messages waiting in the task queues.",
+            labels=["queue"],
+        )
+        try:
+            with celery_app.connection_for_write() as connection:
+                channel = connection.default_channel
+                for queue in get_queue_names():
+                    try:
+                        (_, message_count, _) = channel.queue_declare(
+                            queue=queue, passive=True
+                        )
+                    except Exception:
+                        # The queue is not declared yet.
+                        continue
+                    queue_depth.add_metric([queue], message_count)
+        except Exception as e:
+            logger.warning(f"Could not read the queue depth: {e}")
+        yield queue_depth
+
+        cases = GaugeMetricFamily(
+            "ctsm_cases", "Number of cases by status.", labels=["status"]
+        )
+        with SessionLocal() as db:
+            for (status, count) in db.query(
+                models.CaseModel.status, func.count(models.CaseModel.id)
+            ).group_by(models.CaseModel.status):
+                cases.add_metric([status], count)
+        yield cases
+
+
+def get_metrics() -> bytes:
+    registry = CollectorRegistry()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        for metrics_path in settings.METRICS_ROOT.iterdir():
+            if metrics_path.is_dir():
+                multiprocess.MultiProcessCollector(registry, path=str(metrics_path))
+    else:
+        registry.register(REGISTRY)
+    registry.register(LiveCollector())
+    return generate_latest(registry)
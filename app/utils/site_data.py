@@ -0,0 +1,212 @@
+"""
+A content-addressed store of the site data of cases.
+
+Most cases of a site use the same data zip file, so each data file is extracted once
+to `DATA_STORE_ROOT/<data digest>/data`, and the data root of each case is a view of it,
+where files are hard links to the store (or copies if hard links are not supported).
+Only user_mods/shell_commands is written for each case, so files in case data roots
+must be replaced instead of being written in place. Store files are read-only,
+so writing them in place fails instead of changing the data of other cases.
+Each case using the data holds a reference to it in `<data digest>/refs/<case folder>`,
+and the data is removed when its last reference is released.
+
+The digest of the data downloaded from each data URL is kept with its ETag and
+Last-Modified headers, so the data is only downloaded again if it changed.
+Data is fetched from a URL by one process at a time, so cases created together
+with the same URL wait for the first download instead of downloading it again.
+
+Uploaded data is kept in `uploads/<data digest>.zip` until it is stored.
+"""
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+from pathlib import Path
+from typing import IO, Any, Dict, Mapping, Optional
+from zipfile import ZipFile
+
+from app.core import settings
+from app.utils.locks import file_lock
+from app.utils.logger import logger
+
+DATA_DIR = "data"
+REFS_DIR = "refs"
+URLS_DIR = "urls"
+UPLOADS_DIR = "uploads"
+
+
+def get_entry_path(digest: str) -> Path:
+    return settings.DATA_STORE_ROOT / digest
+
+
+def get_data_path(digest: str) -> Path:
+    return get_entry_path(digest) / DATA_DIR
+
+
+def get_lock_path(digest: str) -> Path:
+    return settings.DATA_STORE_ROOT / f"{digest}.lock"
+
+
+def has_data(digest: str) -> bool:
+    return get_data_path(digest).exists()
+
+
+def make_read_only(path: Path) -> None:
+    for f in path.rglob("*"):
+        if f.is_file() and not f.is_symlink():
+            f.chmod(f.stat().st_mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+def store_data(digest: str, data_file_obj: IO[bytes]) -> None:
+    """
+    Extract the given data zip file to the store, unless it is already stored.
+    """
+    with file_lock(get_lock_path(digest)):
+        if has_data(digest):
+            return
+
+        # The data is extracted to a temporary folder first,
+        # so the store never has partially extracted data.
+        tmp_path = Path(
+            tempfile.mkdtemp(dir=settings.DATA_STORE_ROOT, prefix=f".{digest}-")
+        )
+        try:
+            data_file_obj.seek(0)
+            with ZipFile(data_file_obj, "r") as zf:
+                zf.extractall(tmp_path)
+            make_read_only(tmp_path)
+            get_entry_path(digest).mkdir(parents=True, exist_ok=True)
+            os.rename(tmp_path, get_data_path(digest))
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+    logger.info(f"Stored site data {digest}")
+
+
+def link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def link_data(digest: str, output_path: Path, ref: str) -> None:
+    """
+    Create a view of the stored data at output_path, held by the given reference.
+    """
+    with file_lock(get_lock_path(digest)):
+        if not has_data(digest):
+            raise ValueError(f"Data {digest} not found")
+
+        refs_path = get_entry_path(digest) / REFS_DIR
+        refs_path.mkdir(exist_ok=True)
+        (refs_path / ref).touch()
+
+        if output_path.exists():
+            shutil.rmtree(output_path)
+        shutil.copytree(get_data_path(digest), output_path, copy_function=link_or_copy)
+
+
+def release_data(digest: str, ref: str) -> None:
+    """
+    Release the given reference to the stored data,
+    and remove the data if it was its last reference.
+    """
+    if not digest:
+        return
+
+    with file_lock(get_lock_path(digest)):
+        refs_path = get_entry_path(digest) / REFS_DIR
+        (refs_path / ref).unlink(missing_ok=True)
+        if refs_path.exists() and any(refs_path.iterdir()):
+            return
+        shutil.rmtree(get_entry_path(digest), ignore_errors=True)
+    logger.info(f"Removed site data {digest}")
+
+
+def get_url_cache_path(url: str) -> Path:
+    url_hash = hashlib.md5(url.encode("utf-8")).hexdigest()
+    return settings.DATA_STORE_ROOT / URLS_DIR / f"{url_hash}.json"
+
+
+def read_url_cache(url: str) -> Dict[str, Any]:
+    try:
+        with open(get_url_cache_path(url), "r") as f:
+            url_cache = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    return url_cache if url_cache.get("url") == url else {}
+
+
+def get_conditional_headers(url: str) -> Dict[str, str]:
+    """
+    Return the headers of a request for the data at url
+    that is only answered with the data if it changed since it was stored.
+    """
+    url_cache = read_url_cache(url)
+    if not url_cache or not has_data(url_cache["digest"]):
+        return {}
+
+    headers = {}
+    if url_cache.get("etag"):
+        headers["If-None-Match"] = url_cache["etag"]
+    if url_cache.get("last_modified"):
+        headers["If-Modified-Since"] = url_cache["last_modified"]
+    return headers
+
+
+def get_url_lock_path(url: str) -> Path:
+    return get_url_cache_path(url).with_suffix(".lock")
+
+
+def get_cached_digest(url: str) -> Optional[str]:
+    return read_url_cache(url).get("digest")
+
+
+def save_url_cache(url: str, headers: Mapping[str, str], digest: str) -> None:
+    if not headers.get("etag") and not headers.get("last-modified"):
+        return
+
+    url_cache_path = get_url_cache_path(url)
+    url_cache_path.parent.mkdir(parents=True, exist_ok=True)
+    (fd, tmp_path) = tempfile.mkstemp(dir=url_cache_path.parent, suffix=".part")
+    with os.fdopen(fd, "w") as f:
+        json.dump(
+            {
+                "url": url,
+                "digest": digest,
+                "etag": headers.get("etag"),
+                "last_modified": headers.get("last-modified"),
+            },
+            f,
+        )
+    os.replace(tmp_path, url_cache_path)
+
+
+def remove_url_cache(url: str) -> None:
+    get_url_cache_path(url).unlink(missing_ok=True)
+
+
+def get_upload_path(digest: str) -> Path:
+    return settings.DATA_STORE_ROOT / UPLOADS_DIR / f"{digest}.zip"
+
+
+def save_upload(digest: str, data_file_obj: IO[bytes]) -> None:
+    """
+    Keep the given uploaded data until it is stored, unless it is already stored.
+    """
+    upload_path = get_upload_path(digest)
+    if has_data(digest) or upload_path.exists():
+        return
+
+    upload_path.parent.mkdir(parents=True, exist_ok=True)
+    (fd, tmp_path) = tempfile.mkstemp(dir=upload_path.parent, suffix=".part")
+    with os.fdopen(fd, "wb") as f:
+        data_file_obj.seek(0)
+        shutil.copyfileobj(data_file_obj, f)
+    os.replace(tmp_path, upload_path)
+
+
+def remove_upload(digest: str) -> None:
+    get_upload_path(digest).unlink(missing_ok=True)
@@ -0,0 +1,132 @@
+"""
+An in-memory registry of the sites in `resources/config/sites.json`.
+
+The file is parsed once and indexed by site name and location.
+It is parsed again only when its modification time changes.
+"""
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import parse_file_as
+
+from app import schemas
+from app.core import settings
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy is not available for all python versions
+    cKDTree = None
+
+SiteFeature = schemas.Feature[schemas.SiteProperties]
+SiteFeatureCollection = schemas.FeatureCollection[schemas.SiteProperties]
+
+
+def to_cartesian(lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    """
+    Convert coordinates in degrees to points on the unit sphere.
+    Euclidean distances between these points preserve the order of great-circle distances.
+    """
+    lon_rad = np.radians(lon)
+    lat_rad = np.radians(lat)
+    return np.column_stack(
+        [
+            np.cos(lat_rad) * np.cos(lon_rad),
+            np.cos(lat_rad) * np.sin(lon_rad),
+            np.sin(lat_rad),
+        ]
+    )
+
+
+class SiteIndex:
+    """The parsed sites, indexed by name and location."""
+
+    def __init__(self, sites: SiteFeatureCollection):
+        self.sites = sites
+        self.sites_by_name: Dict[str, SiteFeature] = {
+            f.properties.name: f for f in sites.features if f.properties
+        }
+        # GeoJSON coordinates are in (lon, lat) order.
+        self.coordinates = np.array(
+            [f.geometry.coordinates for f in sites.features], dtype=float
+        ).reshape(-1, 2)
+        self.points = to_cartesian(self.coordinates[:, 0], self.coordinates[:, 1])
+        self.tree = (
+            cKDTree(self.points) if cKDTree is not None and len(self.points) else None
+        )
+
+
+class SiteRegistry:
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._index = SiteIndex(SiteFeatureCollection(features=[]))
+
+    def _get_index(self) -> SiteIndex:
+        try:
+            mtime: Optional[float] = self.path.stat().st_mtime
+        except FileNotFoundError:
+            mtime = None
+
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._index = SiteIndex(
+                        parse_file_as(SiteFeatureCollection, self.path)
+                        if mtime is not None
+                        else SiteFeatureCollection(features=[])
+                    )
+                    self._mtime = mtime
+
+        return self._index
+
+    def get_all(self) -> SiteFeatureCollection:
+        return self._get_index().sites
+
+    def get(self, site_name: str) -> Optional[schemas.SiteProperties]:
+        site = self._get_index().sites_by_name.get(site_name)
+        return site.properties if site else None
+
+    def get_nearest(self, lat: float, lon: float, count: int = 1) -> List[SiteFeature]:
+        """
+        Return the `count` sites nearest to the given location, nearest first.
+        """
+        index = self._get_index()
+        features = index.sites.features
+        count = min(count, len(features))
+        if count == 0:
+            return []
+
+        point = to_cartesian(np.array([lon]), np.array([lat]))[0]
+        if index.tree is not None:
+            (_, indices) = index.tree.query(point, k=count)
+            indices = np.atleast_1d(indices)
+        else:
+            distances = np.linalg.norm(index.points - point, axis=1)
+            indices = np.argsort(distances)[:count]
+
+        return [features[i] for i in indices]
+
+    def get_in_bbox(self, bbox: Tuple[float, float, float, float]) -> List[SiteFeature]:
+        """
+        Return the sites inside the given bbox, in (min_lon, min_lat, max_lon, max_lat) order.
+        Boxes crossing the antimeridian have min_lon greater than max_lon.
+        """
+        index = self._get_index()
+        (min_lon, min_lat, max_lon, max_lat) = bbox
+        lon = index.coordinates[:, 0]
+        lat = index.coordinates[:, 1]
+
+        in_lat = (lat >= min_lat) & (lat <= max_lat)
+        if min_lon <= max_lon:
+            in_lon = (lon >= min_lon) & (lon <= max_lon)
+        else:
+            in_lon = (lon >= min_lon) | (lon <= max_lon)
+
+        features = index.sites.features
+        return [features[i] for i in np.flatnonzero(in_lat & in_lon)]
+
+
+site_registry = SiteRegistry(settings.SITES_PATH)
@@ -0,0 +1,211 @@
+"""
+Summaries of the history output of cases, computed once after each run.
+
+Dashboards show the same aggregates of a few variables over and over
+(e.g. monthly and annual means of GPP), so these are computed after each run
+and stored as Parquet files in `SUMMARIES_ROOT/<case folder>/`,
+instead of reading all the history files for each view.
+Sums and counts are stored rather than means, so when a run is continued,
+only the new history files are read and merged into the stored periods.
+Summaries are computed again from scratch when a history file that was already read
+changes (e.g. when the case is run again from the start) or when the settings change.
+"""
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import xarray as xr
+
+from app import schemas
+from app.core import settings
+from app.utils import history
+from app.utils.locks import file_lock
+from app.utils.logger import logger
+
+MANIFEST_FILE = "summaries.json"
+SUM_PREFIX = "sum:"
+COUNT_PREFIX = "count:"
+
+
+def get_summaries_path(case_folder_name: str) -> Path:
+    return settings.SUMMARIES_ROOT / case_folder_name
+
+
+def get_summary_path(case_folder_name: str, frequency: str) -> Path:
+    return get_summaries_path(case_folder_name) / f"{frequency}.parquet"
+
+
+def get_summaries_config() -> Dict[str, Any]:
+    return {
+        "tape": settings.SUMMARY_TAPE,
+        "variables": settings.SUMMARY_VARIABLES,
+        "frequencies": settings.SUMMARY_FREQUENCIES,
+    }
+
+
+def read_manifest(case_folder_name: str) -> Dict[str, Any]:
+    try:
+        with open(get_summaries_path(case_folder_name) / MANIFEST_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def write_manifest(case_folder_name: str, manifest: Dict[str, Any]) -> None:
+    manifest_path = get_summaries_path(case_folder_name) / MANIFEST_FILE
+    tmp_path = manifest_path.with_suffix(".part")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def remove_summaries(case_folder_name: str) -> None:
+    shutil.rmtree(get_summaries_path(case_folder_name), ignore_errors=True)
+
+
+def get_file_state(history_file: Path) -> List[int]:
+    stat = history_file.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def summarize_chunk(chunk: xr.Dataset, variables: List[str], freq: str) -> pd.DataFrame:
+    """Return the sums and counts of the given data over resampling periods."""
+    resampled = chunk.resample({history.TIME_DIM: freq}, closed="left", label="left")
+    sums = dict(history.to_columns(resampled.sum(), variables))
+    counts = dict(history.to_columns(resampled.count(), variables))
+    index = pd.Index(sums.pop(history.TIME_DIM), name=history.TIME_DIM)
+    counts.pop(history.TIME_DIM)
+    return pd.DataFrame(
+        {
+            **{f"{SUM_PREFIX}{name}": values for (name, values) in sums.items()},
+            **{f"{COUNT_PREFIX}{name}": values for (name, values) in counts.items()},
+        },
+        index=index,
+    )
+
+
+def read_summary_frame(summary_path: Path) -> pd.DataFrame:
+    return pq.read_table(summary_path).to_pandas().set_index(history.TIME_DIM)
+
+
+def write_summary_frame(summary_path: Path, summary: pd.DataFrame) -> None:
+    table = pa.Table.from_pandas(
+        summary.sort_index().reset_index(), preserve_index=False
+    )
+    tmp_path = summary_path.with_suffix(".part")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, summary_path)
+
+
+def update_summaries(case_path: Path, case_folder_name: str) -> None:
+    """
+    Add the history files that are not summarized yet to the summaries of the case.
+    """
+    files = history.get_history_files(case_path).get(settings.SUMMARY_TAPE, [])
+    summaries_path = get_summaries_path(case_folder_name)
+
+    with file_lock(settings.SUMMARIES_ROOT / f"{case_folder_name}.lock"):
+        manifest = read_manifest(case_folder_name)
+        config = get_summaries_config()
+        file_states = {f.name: get_file_state(f) for f in files}
+        summarized_files: Dict[str, List[int]] = manifest.get("files", {})
+        if manifest.get("config") != config or any(
+            file_states.get(name) != state for (name, state) in summarized_files.items()
+        ):
+            remove_summaries(case_folder_name)
+            summarized_files = {}
+
+        new_files = [f for f in files if f.name not in summarized_files]
+        if not new_files:
+            return
+
+        variables = [
+            v.name
+            for v in history.get_history_variables(files[0])
+            if v.name in settings.SUMMARY_VARIABLES
+        ]
+        summaries_path.mkdir(parents=True, exist_ok=True)
+        frames: Dict[str, Optional[pd.DataFrame]] = {
+            frequency: (
+                read_summary_frame(get_summary_path(case_folder_name, frequency))
+                if get_summary_path(case_folder_name, frequency).exists()
+                else None
+            )
+            for frequency in settings.SUMMARY_FREQUENCIES
+        }
+        if variables:
+            for chunk in history.iter_history(new_files, variables):
+                for (frequency, freq) in settings.SUMMARY_FREQUENCIES.items():
+                    frame = summarize_chunk(chunk, variables, freq)
+                    previous_frame = frames[frequency]
+                    frames[frequency] = (
+                        frame
+                        if previous_frame is None
+                        else previous_frame.add(frame, fill_value=0)
+                    )
+        for (frequency, frame) in frames.items():
+            if frame is not None:
+                summary_path = get_summary_path(case_folder_name, frequency)
+                write_summary_frame(summary_path, frame)
+
+        write_manifest(
+            case_folder_name,
+            {
+                "config": config,
+                "variables": variables,
+                "files": {
+                    **summarized_files,
+                    **{f.name: file_states[f.name] for f in new_files},
+                },
+                "date_updated": datetime.now().isoformat(),
+            },
+        )
+    logger.info(
+        f"Summarized {len(new_files)} history files of case folder {case_folder_name}"
+    )
+
+
+def get_summary_info(case_folder_name: str) -> Optional[schemas.HistorySummary]:
+    manifest = read_manifest(case_folder_name)
+    if not manifest:
+        return None
+    return schemas.HistorySummary(
+        tape=manifest["config"]["tape"],
+        frequencies=list(manifest["config"]["frequencies"]),
+        variables=manifest["variables"],
+        files=len(manifest["files"]),
+        date_updated=manifest["date_updated"],
+    )
+
+
+def read_summary(
+    case_folder_name: str, frequency: str, variables: Optional[List[str]] = None
+) -> Optional[Dict[str, List[Any]]]:
+    """
+    Return the means over the periods of the given summary, by column.
+    Columns are named as in `history.to_columns`.
+    """
+    if frequency not in settings.SUMMARY_FREQUENCIES:
+        return None
+    summary_path = get_summary_path(case_folder_name, frequency)
+    if not summary_path.exists():
+        return None
+
+    frame = read_summary_frame(summary_path)
+    columns: Dict[str, List[Any]] = {history.TIME_DIM: frame.index.tolist()}
+    for column in frame.columns:
+        if not column.startswith(SUM_PREFIX):
+            continue
+        name = column[len(SUM_PREFIX) :]
+        if variables and name.split("[")[0] not in variables:
+            continue
+        counts = frame[f"{COUNT_PREFIX}{name}"]
+        means = frame[column] / counts.where(counts > 0)
+        columns[name] = [history.to_json_value(value) for value in means.to_numpy()]
+    return columns
@@ -0,0 +1,166 @@
+"""
+Simulate workers writing case statuses while the API lists cases, on a SQLite database.
+
+Each worker process writes statuses the way `update_status` does, with a new session
+for each write, while the main process lists cases like `GET /cases/`.
+It compares an engine with the default SQLite settings with the engine of
+`app.db.session`, which sets WAL, busy_timeout and synchronous=NORMAL on each connection.
+A temporary SQLite database is used, so the application database is not touched.
+
+Run it from the project root with the same environment as the API, e.g.:
+    PYTHONPATH=. python benchmarks/db_concurrency.py --workers 8 --writes 200
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+from app.db.base import Base
+from app.db.session import create_db_engine
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--cases", type=int, default=2000)
+parser.add_argument("--workers", type=int, default=8)
+parser.add_argument("--writes", type=int, default=200)
+parser.add_argument("--page-size", type=int, default=100)
+
+
+def create_default_engine(database_uri: str) -> Engine:
+    """The engine used before the SQLite settings."""
+    return create_engine(database_uri, connect_args={"check_same_thread": False})
+
+
+def populate_db(engine: Engine, n_cases: int) -> None:
+    SessionLocal = sessionmaker(bind=engine)
+    date_created = str(datetime.now())
+    with SessionLocal() as db:
+        for i in range(n_cases):
+            db.add(
+                models.CaseModel(
+                    id=f"{i:032x}",
+                    name=f"case {i}",
+                    compset="2000_DATM%GSWP3v1_CLM51%FATES_SICE_SOCN_MOSART_SGLC_SWAV",
+                    variables=[],
+                    data_digest="",
+                    driver=schemas.ModelDriver.nuopc,
+                    model_version="benchmark",
+                    env={},
+                    status=schemas.CaseCreateStatus.CONFIGURED,
+                    date_created=date_created,
+                )
+            )
+        db.commit()
+
+
+def write_statuses(
+    create_engine_fn: Callable[[str], Engine],
+    database_uri: str,
+    worker: int,
+    n_writes: int,
+    n_cases: int,
+    results: "multiprocessing.Queue[Tuple[List[float], int]]",
+) -> None:
+    SessionLocal = sessionmaker(bind=create_engine_fn(database_uri))
+    statuses = [schemas.CaseRunStatus.BUILDING, schemas.CaseRunStatus.BUILT]
+    timings = []
+    errors = 0
+    for i in range(n_writes):
+        start = time.time()
+        try:
+            with SessionLocal() as db:
+                case = crud.case.get(db, id=f"{(worker * n_writes + i) % n_cases:032x}")
+                crud.case.update(db, db_obj=case, obj_in={"status": statuses[i % 2]})
+        except OperationalError:
+            errors += 1
+        timings.append(time.time() - start)
+    results.put((timings, errors))
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)] if values else 0
+
+
+def run(
+    label: str, create_engine_fn: Callable[[str], Engine], args: argparse.Namespace
+) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_uri = f"sqlite:///{Path(tmp_dir) / 'benchmark.sqlite'}"
+        engine = create_engine_fn(database_uri)
+        Base.metadata.create_all(engine)
+        populate_db(engine, args.cases)
+
+        results: "multiprocessing.Queue[Tuple[List[float], int]]" = (
+            multiprocessing.Queue()
+        )
+        workers = [
+            multiprocessing.Process(
+                target=write_statuses,
+                args=(
+                    create_engine_fn,
+                    database_uri,
+                    worker,
+                    args.writes,
+                    args.cases,
+                    results,
+                ),
+            )
+            for worker in range(args.workers)
+        ]
+        start = time.time()
+        for process in workers:
+            process.start()
+
+        SessionLocal = sessionmaker(bind=engine)
+        list_timings = []
+        list_errors = 0
+        while any(process.is_alive() for process in workers):
+            list_start = time.time()
+            try:
+                with SessionLocal() as db:
+                    crud.case.get_all_cases_with_site(db, limit=args.page_size)
+            except OperationalError:
+                list_errors += 1
+            list_timings.append(time.time() - list_start)
+
+        write_timings: List[float] = []
+        write_errors = 0
+        for _ in workers:
+            (timings, errors) = results.get()
+            write_timings.extend(timings)
+            write_errors += errors
+        for process in workers:
+            process.join()
+        duration = time.time() - start
+
+    print(f"{label}:")
+    print(
+        f"  {len(write_timings)} writes in {duration:.1f} seconds, "
+        f"{write_errors} failed, "
+        f"p50 {percentile(write_timings, 0.5) * 1000:.1f} ms, "
+        f"p99 {percentile(write_timings, 0.99) * 1000:.1f} ms"
+    )
+    print(
+        f"  {len(list_timings)} listings, {list_errors} failed, "
+        f"p50 {percentile(list_timings, 0.5) * 1000:.1f} ms, "
+        f"p99 {percentile(list_timings, 0.99) * 1000:.1f} ms"
+    )
+
+
+def main() -> None:
+    args = parser.parse_args()
+    run("Default SQLite settings", create_default_engine, args)
+    run("WAL, busy_timeout and synchronous=NORMAL", create_db_engine, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Compare updating a FATES parameter file with one `modify_fates_paramfile.py` call per PFT value
+against the batched, in-process editor in `app.utils.fates`.
+
+Example:
+    python benchmarks/fates_paramfile.py \
+        --model-root resources/model \
+        --paramfile resources/data/shared/lnd/clm2/paramdata/fates_params_api.nc \
+        --params fates_leaf_slatop,fates_leaf_vcmax25top \
+        --pft-indices 1,2,3,4,5,6,7,8,9,10,11,12
+"""
+import argparse
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import xarray as xr
+
+from app.utils.fates import PFT_DIM, update_fates_paramfile
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--model-root", type=str, required=True)
+parser.add_argument("--paramfile", type=str, required=True)
+parser.add_argument("--params", type=str, required=True)
+parser.add_argument("--pft-indices", type=str, required=True)
+
+
+def run_subprocesses(
+    tools_path: Path, param_path: Path, params: dict, pft_indices: list
+) -> None:
+    for param_name, values in params.items():
+        for idx, value in enumerate(values):
+            subprocess.run(
+                [
+                    str(tools_path / "modify_fates_paramfile.py"),
+                    "--fin",
+                    str(param_path),
+                    "--fout",
+                    str(param_path),
+                    "--O",
+                    "--pft",
+                    str(idx + 1),
+                    "--var",
+                    param_name,
+                    "--value",
+                    str(value),
+                ],
+                check=True,
+                capture_output=True,
+            )
+
+    output = param_path.with_suffix(".swapped.nc")
+    subprocess.run(
+        [
+            str(tools_path / "FatesPFTIndexSwapper.py"),
+            "--pft-indices",
+            ",".join(map(str, pft_indices)),
+            "--fin",
+            str(param_path),
+            "--fout",
+            str(output),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    shutil.move(output, param_path)
+
+
+def main() -> None:
+    args = parser.parse_args()
+    tools_path = (
+        Path(args.model_root) / "components" / "clm" / "src" / "fates" / "tools"
+    )
+    pft_indices = [int(i) for i in args.pft_indices.split(",")]
+
+    params = {}
+    with xr.open_dataset(args.paramfile, decode_cf=False) as ds:
+        for param_name in args.params.split(","):
+            param = ds[param_name]
+            # One value per PFT, scaled so the edits are not no-ops.
+            pft_values = param.isel({d: 0 for d in param.dims if d != PFT_DIM})
+            params[param_name] = [float(v) * 1.1 for v in pft_values.values.flat]
+
+    n_edits = sum(len(values) for values in params.values())
+    print(f"{len(params)} parameters, {n_edits} values, {len(pft_indices)} PFTs")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        subprocess_path = Path(tmp_dir) / "subprocess.nc"
+        batched_path = Path(tmp_dir) / "batched.nc"
+        shutil.copy(args.paramfile, subprocess_path)
+        shutil.copy(args.paramfile, batched_path)
+
+        start = time.time()
+        run_subprocesses(tools_path, subprocess_path, params, pft_indices)
+        subprocess_time = time.time() - start
+        print(f"Subprocess per value: {subprocess_time:.2f} seconds")
+
+        start = time.time()
+        update_fates_paramfile(batched_path, params, pft_indices)
+        batched_time = time.time() - start
+        print(f"Batched: {batched_time:.2f} seconds")
+        print(f"Speedup: {subprocess_time / batched_time:.1f}x")
+
+        with xr.open_dataset(subprocess_path, decode_cf=False) as expected:
+            with xr.open_dataset(batched_path, decode_cf=False) as actual:
+                for param_name in params:
+                    if not expected[param_name].equals(actual[param_name]):
+                        print(f"Mismatch in {param_name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Time listing the cases of a site against a database with thousands of cases.
+
+It compares the per-case lookups that `CRUDSite.get_site_cases` used to do
+with the single joined query it uses now.
+A temporary SQLite database is used, so the application database is not touched.
+
+Run it from the project root with the same environment as the API, e.g.:
+    PYTHONPATH=. python benchmarks/site_cases.py --cases 5000
+"""
+import argparse
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import crud, models, schemas
+from app.db.base import Base
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--cases", type=int, default=5000)
+parser.add_argument("--sites", type=int, default=10)
+parser.add_argument("--repeat", type=int, default=5)
+
+
+def populate_db(db: Session, n_cases: int, n_sites: int) -> None:
+    """
+    Fill the database with `n_cases` cases spread evenly over `n_sites` sites.
+    """
+    date_created = str(datetime.now())
+    for i in range(n_cases):
+        case_id = f"{i:032x}"
+        db.add(
+            models.CaseModel(
+                id=case_id,
+                name=f"case {i}",
+                compset="2000_DATM%GSWP3v1_CLM51%FATES_SICE_SOCN_MOSART_SGLC_SWAV",
+                lat=61.0243,
+                lon=8.12343,
+                variables=[
+                    {"name": "STOP_OPTION", "value": "nmonths"},
+                    {"name": "STOP_N", "value": i % 12 + 1},
+                ],
+                data_url=None,
+                data_digest="",
+                driver=schemas.ModelDriver.nuopc,
+                model_version="benchmark",
+                env={"CASE_FOLDER_NAME": case_id, "CASE_DATA_ROOT": ""},
+                status=schemas.CaseCreateStatus.CONFIGURED,
+                date_created=date_created,
+            )
+        )
+        db.add(
+            models.SiteCaseModel(
+                name=f"SITE{i % n_sites}", case_id=case_id, date_created=date_created
+            )
+        )
+    db.commit()
+
+
+def get_site_cases_per_case(db: Session, site_name: str) -> list:
+    """The N+1 lookups done before the single joined query."""
+    cases_and_sites = []
+    for site_case in db.query(models.SiteCaseModel).filter_by(name=site_name):
+        case_and_site = crud.case.get_case_with_site(db, id=site_case.case_id)
+        if case_and_site:
+            (case, _) = case_and_site
+            cases_and_sites.append((case, site_name))
+    return schemas.CaseWithTaskInfo.get_cases_with_task_info(cases_and_sites)
+
+
+def main() -> None:
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(f"sqlite:///{Path(tmp_dir) / 'benchmark.sqlite'}")
+        Base.metadata.create_all(engine)
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        with SessionLocal() as db:
+            start = time.time()
+            populate_db(db, args.cases, args.sites)
+            print(f"Created {args.cases} cases in {time.time() - start:.2f} seconds")
+
+        for (label, list_cases) in [
+            ("Per-case queries", get_site_cases_per_case),
+            (
+                "Joined query",
+                lambda db, site_name: crud.site.get_site_cases(db, site_name=site_name),
+            ),
+        ]:
+            timings = []
+            for _ in range(args.repeat):
+                with SessionLocal() as db:
+                    start = time.time()
+                    n_site_cases = len(list_cases(db, "SITE0"))
+                    timings.append(time.time() - start)
+            print(
+                f"{label}: {n_site_cases} cases, "
+                f"best of {args.repeat}: {min(timings) * 1000:.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
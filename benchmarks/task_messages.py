@@ -0,0 +1,90 @@
+"""
+Compare the task messages of pickled cases with the messages of case ids.
+
+Tasks used to be sent the whole `CaseModel` (with its variables, env and SQLAlchemy state),
+serialized with pickle. They are now sent the case id, serialized as JSON.
+It prints the size of the message bodies, and the number of messages
+that can be sent per second to an in-memory broker with each serializer.
+
+Run it from the project root with the same environment as the API, e.g.:
+    PYTHONPATH=. python benchmarks/task_messages.py --messages 10000
+"""
+import argparse
+import time
+from datetime import datetime
+from typing import Any
+
+from celery import Celery
+from kombu.serialization import dumps
+
+from app import models, schemas
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--messages", type=int, default=10000)
+parser.add_argument("--variables", type=int, default=30)
+
+
+def get_case(n_variables: int) -> models.CaseModel:
+    case_id = f"{0:032x}"
+    return models.CaseModel(
+        id=case_id,
+        name="benchmark case",
+        compset="2000_DATM%GSWP3v1_CLM51%FATES_SICE_SOCN_MOSART_SGLC_SWAV",
+        lat=61.0243,
+        lon=8.12343,
+        variables=[
+            {"name": f"VARIABLE_{i}", "value": [i, i + 1, i + 2]}
+            for i in range(n_variables)
+        ],
+        fates_indices=None,
+        data_url="https://example.org/data/ALP1.zip",
+        data_digest="d41d8cd98f00b204e9800998ecf8427e",
+        driver=schemas.ModelDriver.nuopc,
+        model_version="benchmark",
+        env={
+            "CASE_FOLDER_NAME": case_id,
+            "CASE_DATA_ROOT": f"/ctsm-api/resources/data/{case_id}",
+        },
+        status=schemas.CaseCreateStatus.CONFIGURED,
+        date_created=str(datetime.now()),
+        steps={},
+    )
+
+
+def get_body_size(arg: Any, serializer: str) -> int:
+    # Task messages (protocol 2) have a body of (args, kwargs, embed).
+    (_, _, body) = dumps(((arg,), {}, {}), serializer=serializer)
+    return len(body)
+
+
+def get_send_rate(arg: Any, serializer: str, n_messages: int) -> float:
+    app = Celery("benchmark", broker="memory://")
+    app.conf.task_serializer = serializer
+    app.conf.accept_content = [serializer]
+
+    @app.task(name="benchmark.create_case")
+    def create_case(_: Any) -> None:
+        pass
+
+    start = time.time()
+    for _ in range(n_messages):
+        create_case.apply_async((arg,))
+    return n_messages / (time.time() - start)
+
+
+def main() -> None:
+    args = parser.parse_args()
+    case = get_case(args.variables)
+
+    for (label, arg, serializer) in [
+        ("Pickled case", case, "pickle"),
+        ("Case id as JSON", case.id, "json"),
+    ]:
+        print(
+            f"{label}: {get_body_size(arg, serializer)} bytes, "
+            f"{get_send_rate(arg, serializer, args.messages):.0f} messages per second"
+        )
+
+
+if __name__ == "__main__":
+    main()
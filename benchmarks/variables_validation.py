@@ -0,0 +1,154 @@
+"""
+Time the validation of case variables for large payloads with many variables.
+
+It compares the per-value interpretation of the variables config that
+`CaseBase.validate_case` used to do (linear scan of the choices, `re.match` on the
+pattern string, type switch on the type names) with the validators compiled once
+from the config by `CaseVariableValidator`.
+A synthetic config is used, so the variables config of the API is not needed.
+
+Run it from the project root with the same environment as the API, e.g.:
+    PYTHONPATH=. python benchmarks/variables_validation.py --variables 200 --values 20
+"""
+import argparse
+import re
+import time
+from typing import Any, Callable, Dict, List
+
+from app import schemas
+from app.schemas.cases import CompiledVariablesConfig
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--variables", type=int, default=200)
+parser.add_argument("--values", type=int, default=20)
+parser.add_argument("--choices", type=int, default=50)
+parser.add_argument("--repeat", type=int, default=20)
+
+
+def get_variables_config(
+    n_variables: int, n_choices: int
+) -> List[schemas.CaseVariableConfig]:
+    """
+    Return a config with variables with choices, patterns and ranges in turn.
+    """
+    variables_config = []
+    for i in range(n_variables):
+        config: Dict[str, Any] = {
+            "name": f"VAR_{i}",
+            "category": "user_nl_clm",
+            "allow_multiple": True,
+        }
+        if i % 3 == 0:
+            config["type"] = "char"
+            config["validation"] = {
+                "choices": [
+                    {"value": f"choice_{j}", "label": f"Choice {j}"}
+                    for j in range(n_choices)
+                ]
+            }
+        elif i % 3 == 1:
+            config["type"] = "char"
+            config["validation"] = {"pattern": r"^[a-z]+_\d{1,4}$"}
+        else:
+            config["type"] = "float"
+            config["validation"] = {"min": -1e6, "max": 1e6}
+        variables_config.append(schemas.CaseVariableConfig(**config))
+    return variables_config
+
+
+def get_payload(
+    variables_config: List[schemas.CaseVariableConfig], n_values: int, n_choices: int
+) -> List[schemas.CaseVariable]:
+    payload = []
+    for (i, variable_config) in enumerate(variables_config):
+        if i % 3 == 0:
+            values: List[Any] = [f"choice_{j % n_choices}" for j in range(n_values)]
+        elif i % 3 == 1:
+            values = [f"value_{j}" for j in range(n_values)]
+        else:
+            values = [str(j * 0.5) for j in range(n_values)]
+        payload.append(schemas.CaseVariable(name=variable_config.name, value=values))
+    return payload
+
+
+def validate_interpreted(
+    variables_config: List[schemas.CaseVariableConfig],
+    payload: List[schemas.CaseVariable],
+) -> None:
+    """The per-value interpretation of the config done before the validators."""
+    for variable in payload:
+        variable_config = next(c for c in variables_config if c.name == variable.name)
+        assert isinstance(variable.value, list)
+        for v in variable.value:
+            validated_value: Any = None
+            if variable_config.type == "char" or variable_config.type == "date":
+                validated_value = str(v)
+            elif variable_config.type == "integer":
+                validated_value = int(v)
+            elif variable_config.type == "float":
+                validated_value = float(v)
+            elif variable_config.type == "logical":
+                validated_value = bool(v)
+
+            validation = variable_config.validation
+            if validation and validation.choices:
+                if not next(
+                    filter(
+                        lambda c: c.value == validated_value,  # noqa: B023
+                        validation.choices,
+                    ),
+                    None,
+                ):
+                    raise ValueError(f"Invalid choice {v}")
+            elif validation:
+                if validation.min is not None and validated_value < validation.min:
+                    raise ValueError(f"Invalid value {v}")
+                if validation.max is not None and validated_value > validation.max:
+                    raise ValueError(f"Invalid value {v}")
+                if validation.pattern and not re.match(
+                    validation.pattern, validated_value
+                ):
+                    raise ValueError(f"Invalid value {v}")
+
+
+def validate_compiled(
+    compiled_config: CompiledVariablesConfig, payload: List[schemas.CaseVariable]
+) -> None:
+    for variable in payload:
+        compiled_config.validators[variable.name].validate(variable.value)
+
+
+def main() -> None:
+    args = parser.parse_args()
+
+    variables_config = get_variables_config(args.variables, args.choices)
+    payload = get_payload(variables_config, args.values, args.choices)
+
+    # The compiled config is cached by the API, so it is compiled once here too.
+    start = time.time()
+    compiled_config = CompiledVariablesConfig(variables_config)
+    print(
+        f"Compiled {args.variables} variables in {(time.time() - start) * 1000:.1f} ms"
+    )
+
+    validate: Callable[[], None]
+    for (label, validate) in [
+        (
+            "Interpreted config",
+            lambda: validate_interpreted(variables_config, payload),
+        ),
+        ("Compiled validators", lambda: validate_compiled(compiled_config, payload)),
+    ]:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.time()
+            validate()
+            timings.append(time.time() - start)
+        print(
+            f"{label}: {args.variables} variables x {args.values} values, "
+            f"best of {args.repeat}: {min(timings) * 1000:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
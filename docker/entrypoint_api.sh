@@ -8,6 +8,11 @@ sudo -s -E -u "$USER" bash <<EOF
 
 cd /ctsm-api
 
+# Metrics of the previous run are stale once the processes are restarted.
+export PROMETHEUS_MULTIPROC_DIR=/ctsm-api/resources/metrics/api
+rm -rf "\$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "\$PROMETHEUS_MULTIPROC_DIR"
+
 ./scripts/migrations_forward.sh
 
 if [[ ${DEBUG:-0} == 1 ]]; then
@@ -8,10 +8,22 @@ sudo -s -E -u "$USER" bash <<EOF
 
 cd /ctsm-api
 
+# Metrics of the previous run are stale once the processes are restarted.
+export PROMETHEUS_MULTIPROC_DIR=/ctsm-api/resources/metrics/tasks
+rm -rf "\$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "\$PROMETHEUS_MULTIPROC_DIR"
+
 if [[ ${DEBUG:-0} == 1 ]]; then
-  watchmedo auto-restart --directory=./app --pattern="*.py" --recursive -- celery -A app worker -E --loglevel DEBUG
+  watchmedo auto-restart --directory=./app --pattern="*.py" --recursive -- celery -A app worker -E -Q configure,build,run,data --loglevel DEBUG
 else
-  celery -A app worker -E --loglevel INFO
+  # One worker per queue, so light tasks never wait behind builds and runs.
+  # Builds share the cores of the machine, see WORKER_CORES and BUILD_MAX_CORES.
+  celery -A app worker -E -O fair -Q configure -c ${CONFIGURE_CONCURRENCY:-4} -n configure@%h --loglevel INFO &
+  celery -A app worker -E -O fair -Q build -c ${BUILD_CONCURRENCY:-2} -n build@%h --loglevel INFO &
+  celery -A app worker -E -O fair -Q run -c ${RUN_CONCURRENCY:-1} -n run@%h --loglevel INFO &
+  celery -A app worker -E -O fair -Q data -c ${DATA_CONCURRENCY:-2} -n data@%h --loglevel INFO &
+  # Exit when any worker exits, so the container is restarted.
+  wait -n
 fi
 
 EOF